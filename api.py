@@ -0,0 +1,70 @@
+from functools import cache
+from importlib import import_module
+from dotenv import dotenv_values
+
+# With BACKEND_URL set in .env the frontend talks to a shared server.py instead of
+# opening mydb.db itself, which is how several counters share one database.
+BACKEND_URL = dotenv_values(".env").get("BACKEND_URL")
+
+
+@cache
+def load():
+    # Importing backend pulls in SQLAlchemy and opens and migrates mydb.db, which the window
+    # doesn't need in order to show up. It happens on the first call instead, or earlier
+    # in the background through warm_up.
+    if BACKEND_URL:
+        client = import_module("client")
+        client.connect(BACKEND_URL)
+        return client
+    return import_module("backend")
+
+
+def warm_up() -> None:
+    load()
+
+
+def lazy(name: str):
+    def function(*args, **kwargs):
+        return getattr(load(), name)(*args, **kwargs)
+    function.__name__ = name
+    return function
+
+
+create_item = lazy("create_item")
+create_batch = lazy("create_batch")
+create_item_and_batch = lazy("create_item_and_batch")
+create_bill = lazy("create_bill")
+create_service_bill = lazy("create_service_bill")
+get_item = lazy("get_item")
+get_items = lazy("get_items")
+get_item_changes = lazy("get_item_changes")
+search_items = lazy("search_items")
+get_batches = lazy("get_batches")
+allocate_batches = lazy("allocate_batches")
+get_bill = lazy("get_bill")
+get_service_bill = lazy("get_service_bill")
+get_bills = lazy("get_bills")
+get_service_bills = lazy("get_service_bills")
+day_range = lazy("day_range")
+get_sales_summary = lazy("get_sales_summary")
+get_expiry_summary = lazy("get_expiry_summary")
+get_expiry_items = lazy("get_expiry_items")
+get_value_at_risk = lazy("get_value_at_risk")
+get_stock_valuation = lazy("get_stock_valuation")
+get_stock_value_by_item = lazy("get_stock_value_by_item")
+get_stock_value_by_expiry_month = lazy("get_stock_value_by_expiry_month")
+get_stock_movements = lazy("get_stock_movements")
+get_reorder_suggestions = lazy("get_reorder_suggestions")
+get_fast_movers = lazy("get_fast_movers")
+get_sales_by_period = lazy("get_sales_by_period")
+get_sales_by_payment_type = lazy("get_sales_by_payment_type")
+get_top_items = lazy("get_top_items")
+get_discount_report = lazy("get_discount_report")
+get_gross_margin = lazy("get_gross_margin")
+edit_item = lazy("edit_item")
+edit_batch = lazy("edit_batch")
+delete_item = lazy("delete_item")
+delete_batch = lazy("delete_batch")
+return_stock = lazy("return_stock")
+import_stock = lazy("import_stock")
+release_session = lazy("release_session")
@@ -1,11 +1,46 @@
 import re
 import json
-from datetime import date, datetime
+from datetime import date, datetime, time, timedelta
 from dateutil import relativedelta
-from models import session
-from models import Item, Batch, Bill, ServiceBill
+from models import session, transaction, on_commit
+from models import Item, Batch, Bill, BillLine, ServiceBill, DailySales, ItemDailySales, ItemVelocity, ExpiryBucket, StockSnapshot, StockMovement
+from migrations import rebuild_daily_sales as rebuild_daily_sales_table, rebuild_item_daily_sales_at_sale_cost as rebuild_item_daily_sales_table
+from migrations import rebuild_item_velocity as rebuild_item_velocity_table, VELOCITY_WINDOWS
+from migrations import rebuild_expiry_buckets as rebuild_expiry_buckets_table, EXPIRY_BUCKETS
+from catalogue import ItemCatalogue
+from stock_import import parse_stock_row
+from replenishment import reorder_line
+from reports import get_sales_by_period, get_sales_by_payment_type, get_top_items, get_discount_report, get_gross_margin  # noqa: F401
+
+from sqlalchemy import func, tuple_, update, bindparam, select, literal, union_all
+from sqlalchemy.dialects.sqlite import insert
+
+catalogue = ItemCatalogue()
+batch_table = Batch.__table__
+movement_table = StockMovement.__table__
+
+
+def item_dict(item: Item) -> dict:
+    return {
+        "code": item.code,
+        "name": item.name,
+        "price": str(item.price),
+        "life_cycle": str(item.life_cycle)
+    }
+
 
-from sqlalchemy import func
+def get_catalogue() -> ItemCatalogue:
+    # Query under the lock so a put or remove made while loading waits and is applied on top of the load.
+    with catalogue.lock:
+        if not catalogue.is_loaded():
+            catalogue.load([item_dict(item) for item in session.query(Item).order_by(Item.code)])
+    return catalogue
+
+
+def release_session(failed: bool = False):
+    if failed:
+        session.rollback()
+    session.remove()
 
 
 def get_item(code: str) -> Item | None:
@@ -14,21 +49,26 @@ def get_item(code: str) -> Item | None:
 
 
 def get_items(code_list: list | None = None) -> list[dict]:
+    if code_list is None:
+        return get_catalogue().values()
     items = session.query(Item).order_by(Item.code)
-    if code_list is not None:
-        for filter_code in code_list:
-            items = items.filter(Item.code.contains(filter_code))
-    response = [{
-        "code": item.code,
-        "name": item.name,
-        "price": str(item.price),
-        "life_cycle": str(item.life_cycle)
-    } for item in items]
+    for filter_code in code_list:
+        items = items.filter(Item.code.contains(filter_code))
+    response = [item_dict(item) for item in items]
     return response
 
 
+def search_items(text: str, limit: int = 50) -> list[dict]:
+    return get_catalogue().search(text, limit)
+
+
+def get_item_changes(version: int) -> tuple[int, dict[str, dict | None] | None]:
+    current = get_catalogue()
+    return current.version, current.changes_since(version)
+
+
 def get_batches(item_code: str | None = None, exp_date: date | None = None, obj: bool = False, exact: bool = False) -> list[dict] | list[Batch]:
-    batches = session.query(Batch)
+    batches = session.query(Batch).filter(Batch.quantity != 0)
     if item_code is not None:
         if not exact:
             batches = batches.filter(Batch.item_code.contains(item_code))
@@ -52,25 +92,68 @@ def get_batches(item_code: str | None = None, exp_date: date | None = None, obj:
     return response
 
 
+def allocate_batches(item_code: str, quantity: int, held: dict[str, int] | None = None) -> list[dict]:
+    # First expiry, first out: the quantity is taken from the unexpired batches of the item
+    # in expiry order, less whatever the bill being entered already holds from each batch.
+    # When stock runs short the lines only add up to what is available.
+    held = held or dict()
+    batches = session.query(Batch.batch_no, Batch.quantity, Batch.price, Batch.mfg_date, Batch.exp_date).filter(
+        Batch.item_code == item_code,
+        Batch.exp_date > date.today().replace(day=1),
+        Batch.quantity > 0,
+    ).order_by(Batch.exp_date, Batch.batch_no)
+    lines = list()
+    for batch_no, available, price, mfg_date, exp_date in batches:
+        if quantity <= 0:
+            break
+        taken = min(quantity, available - held.get(batch_no, 0))
+        if taken <= 0:
+            continue
+        lines.append({
+            "item_code": item_code,
+            "batch_no": batch_no,
+            "mfg_date": mfg_date,
+            "exp_date": exp_date,
+            "quantity": taken,
+            "price": price,
+            "total": taken * price,
+        })
+        quantity -= taken
+    return lines
+
+
 def get_bill(id: int) -> Bill | None:
     bill = session.query(Bill).filter(Bill.id == id).scalar()
     return bill
 
 
-def get_bills(date: date | None = None) -> list[dict]:
-    if date is not None:
-        bills = session.query(Bill).filter(func.DATE(Bill.bill_date) == date).order_by(Bill.bill_date.desc())
-    else:
-        bills = session.query(Bill).order_by(Bill.bill_date.desc()).all()
+def day_range(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def get_bills(start: datetime | None = None, end: datetime | None = None, after: tuple[datetime, int] | None = None, limit: int | None = None) -> list[dict]:
+    bills = session.query(
+        Bill.id, Bill.customer_name, Bill.total_amount, Bill.discount, Bill.net_amount, Bill.payment_type, Bill.bill_date
+    )
+    if start is not None:
+        bills = bills.filter(Bill.bill_date >= start)
+    if end is not None:
+        bills = bills.filter(Bill.bill_date < end)
+    if after is not None:
+        bills = bills.filter(tuple_(Bill.bill_date, Bill.id) < after)
+    bills = bills.order_by(Bill.bill_date.desc(), Bill.id.desc())
+    if limit is not None:
+        bills = bills.limit(limit)
     response = [{
         "id": str(bill.id),
         "customer_name": bill.customer_name,
-        "bill_json": json.loads(bill.bill_json),
         "total_amount": str(bill.total_amount),
         "discount": str(bill.discount),
         "net_amount": str(bill.net_amount),
         "payment_type": bill.payment_type,
-        "bill_date": bill.bill_date.strftime("%Y-%m-%d %H:%M:%S")
+        "bill_date": bill.bill_date.strftime("%Y-%m-%d %H:%M:%S"),
+        "cursor": (bill.bill_date, bill.id),
     } for bill in bills]
     return response
 
@@ -80,132 +163,755 @@ def get_service_bill(id: int) -> ServiceBill | None:
     return service_bill
 
 
-def get_service_bills(date: date | None = None) -> list[dict]:
-    if date is not None:
-        service_bills = session.query(ServiceBill).filter(func.DATE(ServiceBill.bill_date) == date).order_by(ServiceBill.bill_date.desc())
-    else:
-        service_bills = session.query(ServiceBill).order_by(ServiceBill.bill_date.desc()).all()
+def get_service_bills(start: datetime | None = None, end: datetime | None = None, after: tuple[datetime, int] | None = None, limit: int | None = None) -> list[dict]:
+    service_bills = session.query(
+        ServiceBill.id, ServiceBill.patient_name, ServiceBill.total_amount, ServiceBill.discount, ServiceBill.net_amount, ServiceBill.payment_type, ServiceBill.bill_date
+    )
+    if start is not None:
+        service_bills = service_bills.filter(ServiceBill.bill_date >= start)
+    if end is not None:
+        service_bills = service_bills.filter(ServiceBill.bill_date < end)
+    if after is not None:
+        service_bills = service_bills.filter(tuple_(ServiceBill.bill_date, ServiceBill.id) < after)
+    service_bills = service_bills.order_by(ServiceBill.bill_date.desc(), ServiceBill.id.desc())
+    if limit is not None:
+        service_bills = service_bills.limit(limit)
     response = [{
         "id": str(bill.id),
         "patient_name": bill.patient_name,
-        "bill_json": json.loads(bill.bill_json),
         "total_amount": str(bill.total_amount),
         "discount": str(bill.discount),
         "net_amount": str(bill.net_amount),
         "payment_type": bill.payment_type,
-        "bill_date": bill.bill_date.strftime("%Y-%m-%d %H:%M:%S")
+        "bill_date": bill.bill_date.strftime("%Y-%m-%d %H:%M:%S"),
+        "cursor": (bill.bill_date, bill.id),
     } for bill in service_bills]
     return response
 
 
+def iter_bill_chunks(start: datetime, end: datetime, bill_type: str = "bill", chunk_size: int = 500):
+    # Oldest first, one chunk of full bills at a time so a long range never sits in memory.
+    model = Bill if bill_type == "bill" else ServiceBill
+    name = Bill.customer_name if bill_type == "bill" else ServiceBill.patient_name
+    after: tuple[datetime, int] | None = None
+    while True:
+        bills = session.query(
+            model.id, model.bill_date, name, model.total_amount, model.discount, model.net_amount, model.payment_type, model.bill_json
+        ).filter(model.bill_date >= start, model.bill_date < end)
+        if after is not None:
+            bills = bills.filter(tuple_(model.bill_date, model.id) > after)
+        rows = bills.order_by(model.bill_date, model.id).limit(chunk_size).all()
+        if not rows:
+            return None
+        yield [row._asdict() for row in rows]
+        after = (rows[-1].bill_date, rows[-1].id)
+
+
+def get_item_sales(start: datetime | None = None, end: datetime | None = None, item_code: str | None = None, by_batch: bool = False) -> list[dict]:
+    columns = [BillLine.item_code, BillLine.batch_no] if by_batch else [BillLine.item_code]
+    sales = session.query(*columns, func.sum(BillLine.quantity).label("quantity"), func.sum(BillLine.total).label("total"))
+    sales = sales.join(Bill, Bill.id == BillLine.bill_id)
+    if start is not None:
+        sales = sales.filter(Bill.bill_date >= start)
+    if end is not None:
+        sales = sales.filter(Bill.bill_date < end)
+    if item_code is not None:
+        sales = sales.filter(BillLine.item_code == item_code)
+    sales = sales.group_by(*columns).order_by(*columns)
+    response = list()
+    for row in sales:
+        row_dict = {"item_code": row.item_code, "quantity": row.quantity, "total": row.total}
+        if by_batch:
+            row_dict["batch_no"] = row.batch_no
+        response.append(row_dict)
+    return response
+
+
+def get_daily_sales(start: date | None = None, end: date | None = None, bill_type: str = "bill", by_payment_type: bool = False) -> list[dict]:
+    columns = [DailySales.sales_date, DailySales.payment_type] if by_payment_type else [DailySales.sales_date]
+    sales = session.query(
+        *columns,
+        func.sum(DailySales.bill_count).label("bill_count"),
+        func.sum(DailySales.gross).label("gross"),
+        func.sum(DailySales.discount).label("discount"),
+        func.sum(DailySales.net).label("net"),
+    ).filter(DailySales.bill_type == bill_type)
+    if start is not None:
+        sales = sales.filter(DailySales.sales_date >= start)
+    if end is not None:
+        sales = sales.filter(DailySales.sales_date < end)
+    sales = sales.group_by(*columns).order_by(*columns)
+    response = list()
+    for row in sales:
+        row_dict = {"sales_date": row.sales_date, "bill_count": row.bill_count, "gross": row.gross, "discount": row.discount, "net": row.net}
+        if by_payment_type:
+            row_dict["payment_type"] = row.payment_type
+        response.append(row_dict)
+    return response
+
+
+def get_sales_summary(start: date | None = None, end: date | None = None, bill_type: str = "bill") -> dict:
+    summary = session.query(
+        func.coalesce(func.sum(DailySales.bill_count), 0).label("bill_count"),
+        func.coalesce(func.sum(DailySales.gross), 0).label("gross"),
+        func.coalesce(func.sum(DailySales.discount), 0).label("discount"),
+        func.coalesce(func.sum(DailySales.net), 0).label("net"),
+    ).filter(DailySales.bill_type == bill_type)
+    if start is not None:
+        summary = summary.filter(DailySales.sales_date >= start)
+    if end is not None:
+        summary = summary.filter(DailySales.sales_date < end)
+    row = summary.one()
+    return {"bill_count": row.bill_count, "gross": row.gross, "discount": row.discount, "net": row.net}
+
+
+# The rollup upserts are built once and run on the session's connection, building them and
+# their excluded aliases and going through the ORM on every bill cost more than running them.
+daily_sales_table = DailySales.__table__
+add_daily_sales = insert(daily_sales_table)
+add_daily_sales = add_daily_sales.on_conflict_do_update(
+    index_elements=[daily_sales_table.c.sales_date, daily_sales_table.c.bill_type, daily_sales_table.c.payment_type],
+    set_={
+        "bill_count": daily_sales_table.c.bill_count + 1,
+        "gross": daily_sales_table.c.gross + add_daily_sales.excluded.gross,
+        "discount": daily_sales_table.c.discount + add_daily_sales.excluded.discount,
+        "net": daily_sales_table.c.net + add_daily_sales.excluded.net,
+    }
+)
+item_sales_table = ItemDailySales.__table__
+add_item_sales = insert(item_sales_table)
+add_item_sales = add_item_sales.on_conflict_do_update(
+    index_elements=[item_sales_table.c.sales_date, item_sales_table.c.item_code],
+    set_={
+        "quantity": item_sales_table.c.quantity + add_item_sales.excluded.quantity,
+        "total": item_sales_table.c.total + add_item_sales.excluded.total,
+        "cost": item_sales_table.c.cost + add_item_sales.excluded.cost,
+        "uncosted": item_sales_table.c.uncosted + add_item_sales.excluded.uncosted,
+    }
+)
+velocity_table = ItemVelocity.__table__
+add_item_velocity = insert(velocity_table)
+add_item_velocity = add_item_velocity.on_conflict_do_update(
+    index_elements=[velocity_table.c.item_code],
+    set_={f"sold_{days}": velocity_table.c[f"sold_{days}"] + add_item_velocity.excluded[f"sold_{days}"] for days in VELOCITY_WINDOWS},
+)
+
+
+def add_to_daily_sales(bill_type: str, bill_date: datetime, payment_type: str, total_amount: float, discount: float, net_amount: float):
+    session.connection().execute(add_daily_sales, {
+        "sales_date": bill_date.date(),
+        "bill_type": bill_type,
+        "payment_type": payment_type,
+        "bill_count": 1,
+        "gross": total_amount,
+        "discount": discount,
+        "net": net_amount,
+    })
+
+
+def add_to_item_sales(bill_date: datetime, bill_json: list[dict], prices: dict[tuple[str, str], float]):
+    # Lines are costed at the batch prices deduct_stock read while selling, so later price
+    # edits don't change past margins.
+    sales: dict[str, dict] = dict()
+    for line in bill_json:
+        if line.get("item_code") is None:
+            continue
+        row = sales.setdefault(line.get("item_code"), {
+            "sales_date": bill_date.date(), "item_code": line.get("item_code"), "quantity": 0, "total": 0.0, "cost": 0.0, "uncosted": 0.0,
+        })
+        row["quantity"] += line.get("quantity")
+        row["total"] += line.get("total") or 0.0
+        price = prices.get((line.get("item_code"), line.get("batch_no")))
+        if price is None:
+            row["uncosted"] += line.get("total") or 0.0
+        else:
+            row["cost"] += line.get("quantity") * price
+    if not sales:
+        return None
+    roll_item_velocity()
+    connection = session.connection()
+    connection.execute(add_item_sales, list(sales.values()))
+
+    # The rolling windows only take the bill if its day falls inside them.
+    today = date.today()
+    age = (today - bill_date.date()).days
+    if 0 <= age < max(VELOCITY_WINDOWS):
+        velocity = [{
+            "item_code": item_code,
+            **{f"sold_{days}": row.get("quantity") if age < days else 0 for days in VELOCITY_WINDOWS},
+            "as_of": today,
+        } for item_code, row in sales.items()]
+        connection.execute(add_item_velocity, velocity)
+
+
+def rebuild_daily_sales():
+    with transaction():
+        rebuild_daily_sales_table(session.connection())
+
+
+def rebuild_item_daily_sales():
+    today = date.today()
+    with transaction():
+        rebuild_item_daily_sales_table(session.connection())
+        rebuild_item_velocity_table(session.connection(), today)
+        on_commit(lambda: rolled_on.update(velocity=today))
+
+
+# The day each daily rebuild last committed, keyed "velocity", "expiry" and "stock_snapshot".
+# It is only set once the rebuild's outermost transaction commits, so a rolled back
+# rebuild is retried on the next call.
+rolled_on: dict[str, date] = dict()
+
+
+def roll_item_velocity():
+    # Bills add to item_velocity as they are saved, and the first call of a day rebuilds it
+    # from item_daily_sales so the days that fell out of each window are dropped.
+    today = date.today()
+    if rolled_on.get("velocity") == today:
+        return None
+    with transaction():
+        if session.query(ItemVelocity.id).filter(ItemVelocity.as_of != today).first() is not None:
+            rebuild_item_velocity_table(session.connection(), today)
+        on_commit(lambda: rolled_on.update(velocity=today))
+
+
+def item_velocity(lead_days: int | None = None):
+    # Units sold per item over the last 7, 30 and 90 days next to the unexpired stock on hand.
+    # With lead_days only the items that could be at their reorder point are returned,
+    # reorder_line makes the exact call.
+    roll_item_velocity()
+    today = date.today()
+    stock = select(Batch.item_code, func.sum(Batch.quantity).label("on_hand")).where(
+        Batch.quantity > 0, Batch.exp_date > today.replace(day=1)
+    ).group_by(Batch.item_code).subquery()
+    on_hand = func.coalesce(stock.c.on_hand, 0)
+    rows = session.query(
+        Item.code, Item.name, ItemVelocity.sold_7, ItemVelocity.sold_30, ItemVelocity.sold_90, on_hand
+    ).join(ItemVelocity, ItemVelocity.item_code == Item.code).outerjoin(stock, stock.c.item_code == Item.code).filter(ItemVelocity.sold_90 > 0)
+    if lead_days is not None:
+        rows = rows.filter(on_hand < func.max(ItemVelocity.sold_7 / 7.0, ItemVelocity.sold_30 / 30.0) * lead_days + 1)
+    return rows
+
+
+def velocity_dict(code: str, name: str, sold_7: int, sold_30: int, sold_90: int, on_hand: int, line: dict) -> dict:
+    return {
+        "code": code,
+        "name": name,
+        "sold_7": str(sold_7),
+        "sold_30": str(sold_30),
+        "sold_90": str(sold_90),
+        "on_hand": str(on_hand),
+        "daily_rate": "{:.2f}".format(line.get("rate")),
+        "days_left": "{:.0f}".format(line.get("days_left")) if line.get("rate") else "-",
+        "reorder_point": str(line.get("reorder_point")),
+        "order_quantity": str(line.get("order_quantity")) if line.get("reorder") else "",
+        "color": (255, 225, 100) if line.get("reorder") else None,
+    }
+
+
+def get_reorder_suggestions(lead_days: int = 7, cover_days: int = 30) -> list[dict]:
+    suggestions = list()
+    for code, name, sold_7, sold_30, sold_90, on_hand in item_velocity(lead_days):
+        line = reorder_line(sold_7, sold_30, on_hand, lead_days, cover_days)
+        if line.get("reorder"):
+            suggestions.append((line.get("days_left"), velocity_dict(code, name, sold_7, sold_30, sold_90, on_hand, line)))
+    suggestions.sort(key=lambda suggestion: suggestion[0])
+    return [suggestion for _, suggestion in suggestions]
+
+
+def get_fast_movers(limit: int = 20, lead_days: int = 7, cover_days: int = 30) -> list[dict]:
+    rows = item_velocity().order_by(ItemVelocity.sold_30.desc(), ItemVelocity.sold_7.desc()).limit(limit)
+    return [
+        velocity_dict(code, name, sold_7, sold_30, sold_90, on_hand, reorder_line(sold_7, sold_30, on_hand, lead_days, cover_days))
+        for code, name, sold_7, sold_30, sold_90, on_hand in rows
+    ]
+
+
+def roll_expiry_buckets():
+    # Buckets are relative to today, so the first call of a day rebuilds every item if the
+    # table was last built on an earlier day. Later calls that day only compare dates.
+    today = date.today()
+    if rolled_on.get("expiry") == today:
+        return None
+    with transaction():
+        oldest = session.query(func.min(ExpiryBucket.as_of)).scalar()
+        if oldest is not None and oldest < today:
+            rebuild_expiry_buckets_table(session.connection(), today=today)
+        on_commit(lambda: rolled_on.update(expiry=today))
+
+
+def refresh_expiry_buckets(item_codes):
+    roll_expiry_buckets()
+    session.flush()
+    rebuild_expiry_buckets_table(session.connection(), sorted(set(item_codes)))
+
+
+def rebuild_expiry_buckets():
+    today = date.today()
+    with transaction():
+        rebuild_expiry_buckets_table(session.connection(), today=today)
+        on_commit(lambda: rolled_on.update(expiry=today))
+
+
+def roll_rollups():
+    # The first lookup of a day rebuilds expiry_bucket and item_velocity, server.py runs
+    # this through its writer first so its reader threads don't write.
+    roll_expiry_buckets()
+    roll_item_velocity()
+
+
+def rollups_rolled() -> bool:
+    today = date.today()
+    return rolled_on.get("expiry") == today and rolled_on.get("velocity") == today
+
+
+def get_expiry_summary() -> list[dict]:
+    roll_expiry_buckets()
+    totals = {
+        bucket: (batch_count, quantity, value) for bucket, batch_count, quantity, value in session.query(
+            ExpiryBucket.bucket, func.sum(ExpiryBucket.batch_count), func.sum(ExpiryBucket.quantity), func.sum(ExpiryBucket.value)
+        ).group_by(ExpiryBucket.bucket)
+    }
+    response = list()
+    for bucket in EXPIRY_BUCKETS:
+        batch_count, quantity, value = totals.get(bucket, (0, 0, 0.0))
+        response.append({
+            "bucket": bucket,
+            "batch_count": str(batch_count),
+            "quantity": str(quantity),
+            "value": "{:.2f}".format(value),
+        })
+    return response
+
+
+def buckets_within(months: int) -> list[str]:
+    return EXPIRY_BUCKETS[:EXPIRY_BUCKETS.index({1: "1_month", 3: "3_months", 6: "6_months"}[months]) + 1]
+
+
+def get_expiry_items(within_months: int = 6) -> list[dict]:
+    # Items with stock that is expired or expires within the given months, most urgent first.
+    roll_expiry_buckets()
+    buckets = buckets_within(within_months)
+    rows = session.query(ExpiryBucket.item_code, Item.name, ExpiryBucket.bucket, ExpiryBucket.quantity, ExpiryBucket.value).join(
+        Item, Item.code == ExpiryBucket.item_code
+    ).filter(ExpiryBucket.bucket.in_(buckets))
+    items: dict[str, dict] = dict()
+    for item_code, name, bucket, quantity, value in rows:
+        item = items.setdefault(item_code, {"code": item_code, "name": name, "at_risk": 0.0, "urgency": len(buckets)})
+        item[bucket] = str(quantity)
+        item["at_risk"] += value
+        item["urgency"] = min(item.get("urgency"), buckets.index(bucket))
+    response = sorted(items.values(), key=lambda item: (item.get("urgency"), -item.get("at_risk")))
+    for item in response:
+        item["color"] = (255, 225, 100) if item.pop("urgency") == 0 else None
+        item["at_risk"] = "{:.2f}".format(item.get("at_risk"))
+    return response
+
+
+def get_value_at_risk(within_months: int = 6) -> dict:
+    roll_expiry_buckets()
+    values = dict(session.query(ExpiryBucket.bucket, func.sum(ExpiryBucket.value)).filter(
+        ExpiryBucket.bucket.in_(buckets_within(within_months))
+    ).group_by(ExpiryBucket.bucket))
+    expired = values.pop("expired", None) or 0.0
+    expiring = sum(value or 0.0 for value in values.values())
+    return {"expired": expired, "expiring": expiring, "total": expired + expiring}
+
+
+def snapshot_stock():
+    # Until the first write of a day the batch table still holds the closing stock of the
+    # last day anything changed, it is kept as yesterday's snapshot unless there is one.
+    today = date.today()
+    if rolled_on.get("stock_snapshot") == today:
+        return None
+    yesterday = today - timedelta(days=1)
+    with transaction():
+        if session.query(StockSnapshot.id).filter(StockSnapshot.snapshot_date >= yesterday).first() is None:
+            session.execute(insert(StockSnapshot.__table__).from_select(
+                ["snapshot_date", "item_code", "batch_no", "quantity", "price", "exp_date"],
+                select(literal(yesterday), batch_table.c.item_code, batch_table.c.batch_no, batch_table.c.quantity, batch_table.c.price, batch_table.c.exp_date)
+                .where(batch_table.c.item_code.isnot(None), batch_table.c.quantity != 0),
+            ))
+        on_commit(lambda: rolled_on.update(stock_snapshot=today))
+
+
+def stock_on(day: date | None = None):
+    # Stock at the end of a past day is the first snapshot taken on or after it, since
+    # nothing changed between that day and the snapshot. Without one it is today's stock.
+    if day is not None and day < date.today():
+        snapshot_date = session.query(func.min(StockSnapshot.snapshot_date)).filter(StockSnapshot.snapshot_date >= day).scalar()
+        if snapshot_date is not None:
+            snapshot = StockSnapshot.__table__
+            return select(snapshot.c.item_code, snapshot.c.batch_no, snapshot.c.quantity, snapshot.c.price, snapshot.c.exp_date).where(
+                snapshot.c.snapshot_date == snapshot_date
+            ).subquery()
+    return select(batch_table.c.item_code, batch_table.c.batch_no, batch_table.c.quantity, batch_table.c.price, batch_table.c.exp_date).where(
+        batch_table.c.item_code.isnot(None), batch_table.c.quantity != 0
+    ).subquery()
+
+
+def get_stock_valuation(day: date | None = None) -> dict:
+    stock = stock_on(day)
+    batch_count, quantity, value = session.query(
+        func.count(), func.coalesce(func.sum(stock.c.quantity), 0), func.coalesce(func.sum(stock.c.quantity * stock.c.price), 0.0)
+    ).select_from(stock).one()
+    return {"batch_count": batch_count, "quantity": quantity, "value": value}
+
+
+def get_stock_value_by_item(day: date | None = None) -> list[dict]:
+    stock = stock_on(day)
+    value = func.sum(stock.c.quantity * stock.c.price)
+    rows = session.query(stock.c.item_code, Item.name, func.count(), func.sum(stock.c.quantity), value).select_from(stock).outerjoin(
+        Item, Item.code == stock.c.item_code
+    ).group_by(stock.c.item_code).order_by(value.desc())
+    return [{
+        "code": item_code,
+        "name": name,
+        "batch_count": str(batch_count),
+        "quantity": str(quantity),
+        "value": "{:.2f}".format(value),
+    } for item_code, name, batch_count, quantity, value in rows]
+
+
+def get_stock_value_by_expiry_month(day: date | None = None) -> list[dict]:
+    stock = stock_on(day)
+    expired = (day or date.today()).replace(day=1)
+    rows = session.query(stock.c.exp_date, func.count(), func.sum(stock.c.quantity), func.sum(stock.c.quantity * stock.c.price)).group_by(
+        stock.c.exp_date
+    ).order_by(stock.c.exp_date)
+    return [{
+        "exp_date": exp_date.strftime("%m/%Y"),
+        "batch_count": str(batch_count),
+        "quantity": str(quantity),
+        "value": "{:.2f}".format(value),
+        "color": (255, 225, 100) if exp_date <= expired else None,
+    } for exp_date, batch_count, quantity, value in rows]
+
+
+def get_stock_movements(item_code: str, start: datetime | None = None, end: datetime | None = None) -> list[dict]:
+    movements = session.query(StockMovement).filter(StockMovement.item_code == item_code)
+    if start is not None:
+        movements = movements.filter(StockMovement.ts >= start)
+    if end is not None:
+        movements = movements.filter(StockMovement.ts < end)
+    return [{
+        "ts": movement.ts.strftime("%d/%m/%Y %H:%M"),
+        "batch_no": movement.batch_no,
+        "kind": movement.kind,
+        "quantity": str(movement.quantity),
+        "bill_id": str(movement.bill_id or ""),
+        "color": (255, 225, 100) if movement.kind == "adjustment" else None,
+    } for movement in movements.order_by(StockMovement.ts, StockMovement.id)]
+
+
+def check_stock_ledger() -> list[dict]:
+    # Batches whose quantity differs from the sum of their movements. Both sides are
+    # grouped straight from the (item_code, batch_no, quantity) indexes in one pass.
+    balances = select(
+        batch_table.c.item_code, batch_table.c.batch_no, batch_table.c.quantity.label("balance"), literal(0).label("ledger")
+    ).where(batch_table.c.item_code.isnot(None))
+    ledger = select(
+        movement_table.c.item_code, movement_table.c.batch_no, literal(0), func.sum(movement_table.c.quantity)
+    ).group_by(movement_table.c.item_code, movement_table.c.batch_no)
+    combined = union_all(balances, ledger).subquery()
+    balance, ledger_quantity = func.sum(combined.c.balance), func.sum(combined.c.ledger)
+    rows = session.execute(
+        select(combined.c.item_code, combined.c.batch_no, balance, ledger_quantity)
+        .group_by(combined.c.item_code, combined.c.batch_no).having(balance != ledger_quantity)
+    )
+    return [
+        {"item_code": item_code, "batch_no": batch_no, "quantity": quantity, "ledger": ledger}
+        for item_code, batch_no, quantity, ledger in rows
+    ]
+
+
 def create_item(name: str, price: float, life_cycle: int | None = None) -> dict | str:
     code = re.sub('[^A-Za-z0-9]+', '', name).lower()
     check_code = session.query(Item).filter(Item.code == code).count()
     if check_code:
         return f"{name} already exists in the database."
     item = Item(code, name, price, life_cycle)
-    session.add(item)
-    session.commit()
-    response = {
-        "code": item.code,
-        "name": item.name,
-        "price": str(item.price),
-        "life_cycle": str(item.life_cycle)
-    }
+    with transaction():
+        session.add(item)
+    response = item_dict(item)
+    catalogue.put(response)
     return response
 
 
 def create_batch(item_code: str, batch_no: str, quantity: int, price: float, mfg_date: date, exp_date: date) -> Batch:
-    batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
-    if batch is None:
-        batch = Batch(item_code, batch_no, quantity, price, mfg_date.replace(day=1), exp_date.replace(day=1))
-    else:
-        batch.quantity += quantity
-        batch.price = price
-        batch.mfg_date = mfg_date.replace(day=1)
-        batch.exp_date = exp_date.replace(day=1)
-    session.add(batch)
-    session.commit()
+    snapshot_stock()
+    with transaction():
+        session.execute(receive_batch, {
+            "item_code": item_code, "batch_no": batch_no, "quantity": quantity, "price": price,
+            "mfg_date": mfg_date.replace(day=1), "exp_date": exp_date.replace(day=1),
+        })
+        expire_batches({(item_code, batch_no)})
+        record_movements("receipt", [{"item_code": item_code, "batch_no": batch_no, "quantity": quantity}])
+        refresh_expiry_buckets([item_code])
+        batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
     return batch
 
 
-def create_bill(customer_name: str, bill_json: list[dict], total_amount: float, discount: float, net_amount: float, payment_type: str, bill_date: datetime) -> Bill:
-    bill = Bill(customer_name, json.dumps(bill_json), total_amount, discount, net_amount, payment_type, bill_date)
-    session.add(bill)
+def record_movements(kind: str, movements: list[dict], bill_id: int | None = None, ts: datetime | None = None):
+    # Every change to Batch.quantity is written to stock_movement in the same transaction,
+    # with the signed change in quantity, so the batch table is the sum of the ledger.
+    rows = [{
+        "ts": ts or datetime.now(),
+        "item_code": movement.get("item_code"),
+        "batch_no": movement.get("batch_no"),
+        "kind": kind,
+        "quantity": movement.get("quantity"),
+        "bill_id": bill_id,
+    } for movement in movements if movement.get("quantity")]
+    if rows:
+        # movement_table.insert() is the core INSERT, unlike the sqlite one it is compiled once and cached.
+        session.connection().execute(movement_table.insert(), rows)
+
+
+deduct_batch = (
+    update(batch_table)
+    .where(batch_table.c.item_code == bindparam("line_item_code"), batch_table.c.batch_no == bindparam("line_batch_no"))
+    .where(batch_table.c.quantity >= bindparam("line_quantity"))
+    .values(quantity=batch_table.c.quantity - bindparam("line_quantity"))
+    .returning(batch_table.c.price)
+)
+restore_batch = (
+    update(batch_table)
+    .where(batch_table.c.item_code == bindparam("line_item_code"), batch_table.c.batch_no == bindparam("line_batch_no"))
+    .values(quantity=batch_table.c.quantity + bindparam("line_quantity"))
+)
+replace_batch = (
+    update(batch_table)
+    .where(batch_table.c.item_code == bindparam("line_item_code"), batch_table.c.batch_no == bindparam("line_batch_no"))
+    .where(batch_table.c.quantity == bindparam("line_previous"))
+    .values(quantity=bindparam("line_quantity"))
+    .returning(batch_table.c.quantity)
+)
+receive_batch = insert(batch_table)
+receive_batch = receive_batch.on_conflict_do_update(
+    index_elements=[batch_table.c.item_code, batch_table.c.batch_no],
+    set_={
+        "quantity": batch_table.c.quantity + receive_batch.excluded.quantity,
+        "price": receive_batch.excluded.price,
+        "mfg_date": receive_batch.excluded.mfg_date,
+        "exp_date": receive_batch.excluded.exp_date,
+    },
+)
+
+
+def set_batch_quantity(item_code: str, batch_no: str, quantity: int) -> int | None:
+    # Edits and deletes set an absolute quantity with a conditional UPDATE that only applies
+    # while the batch still holds the quantity read just before, otherwise it is read again,
+    # so a sale committed in between is never overwritten. The adjustment is recorded from
+    # the quantity the UPDATE replaced, which keeps the ledger equal to the batch table.
+    # Returns the quantity replaced, or None when the batch doesn't exist.
+    connection = session.connection()
+    current = select(batch_table.c.quantity).where(batch_table.c.item_code == item_code, batch_table.c.batch_no == batch_no)
+    while True:
+        previous = connection.execute(current).scalar()
+        if previous is None:
+            return None
+        parameters = {"line_item_code": item_code, "line_batch_no": batch_no, "line_previous": previous, "line_quantity": quantity}
+        if connection.execute(replace_batch, parameters).first() is not None:
+            expire_batches({(item_code, batch_no)})
+            record_movements("adjustment", [{"item_code": item_code, "batch_no": batch_no, "quantity": quantity - previous}])
+            return previous
+
+
+def deduct_stock(sold: dict[tuple[str, str], int], prices: dict[tuple[str, str], float] | None = None) -> list[dict]:
+    # Each batch is decremented by a single conditional UPDATE, so two counters selling
+    # from the same batch can't both read the old quantity and overwrite each other.
+    # On a shortfall the decrements already made are added back and nothing is billed.
+    # Batches stay at 0 when sold out, their price and dates are kept for returns.
+    # The price of each deducted batch is collected into prices when given.
+    connection = session.connection()
+    deducted: list[dict] = list()
+    shortfalls: list[dict] = list()
+    for (item_code, batch_no), quantity in sold.items():
+        parameters = {"line_item_code": item_code, "line_batch_no": batch_no, "line_quantity": quantity}
+        row = connection.execute(deduct_batch, parameters).first()
+        if row is not None:
+            deducted.append(parameters)
+            if prices is not None:
+                prices[(item_code, batch_no)] = row.price
+            continue
+        available = session.query(Batch.quantity).filter(Batch.item_code == item_code, Batch.batch_no == batch_no).scalar()
+        shortfalls.append({"item_code": item_code, "batch_no": batch_no, "requested": quantity, "available": available or 0})
+
+    if shortfalls:
+        if deducted:
+            connection.execute(restore_batch, deducted)
+        return shortfalls
+
+    expire_batches(set(sold))
+    return shortfalls
+
+
+def expire_batches(keys: set[tuple[str, str]]):
+    # Core statements bypass the ORM, batches already loaded in this session are stale.
+    for instance in list(session.identity_map.values()):
+        if isinstance(instance, Batch) and (instance.__dict__.get("item_code"), instance.__dict__.get("batch_no")) in keys:
+            session.expire(instance)
 
+
+def create_bill(customer_name: str, bill_json: list[dict], total_amount: float, discount: float, net_amount: float, payment_type: str, bill_date: datetime) -> Bill | list[dict]:
+    snapshot_stock()
+    sold: dict[tuple[str, str], int] = dict()
     for batch_dict in bill_json:
         batch_no: str = batch_dict.get("batch_no")
         item_code: str = batch_dict.get("item_code")
         quantity: int = batch_dict.get("quantity")
         if batch_no is None or item_code is None:
             continue
-        batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
-        if batch is None:
-            continue
-        if batch.quantity <= quantity:
-            session.delete(batch)
-        else:
-            batch.quantity -= quantity
-    session.commit()
+        sold[(item_code, batch_no)] = sold.get((item_code, batch_no), 0) + quantity
+
+    prices: dict[tuple[str, str], float] = dict()
+    with transaction():
+        shortfalls = deduct_stock(sold, prices)
+        if shortfalls:
+            return shortfalls
+        refresh_expiry_buckets([item_code for item_code, _ in sold])
+
+        bill = Bill(customer_name, json.dumps(bill_json), total_amount, discount, net_amount, payment_type, bill_date)
+        session.add(bill)
+        for batch_dict in bill_json:
+            if batch_dict.get("item_code") is not None:
+                bill.lines.append(BillLine(
+                    batch_dict.get("item_code"),
+                    batch_dict.get("batch_no"),
+                    batch_dict.get("quantity"),
+                    batch_dict.get("price"),
+                    batch_dict.get("total"),
+                    prices.get((batch_dict.get("item_code"), batch_dict.get("batch_no"))),
+                ))
+        session.flush()
+        record_movements("sale", [
+            {"item_code": item_code, "batch_no": batch_no, "quantity": -quantity} for (item_code, batch_no), quantity in sold.items()
+        ], bill.id, bill_date)
+        add_to_daily_sales("bill", bill_date, payment_type, total_amount, discount, net_amount)
+        add_to_item_sales(bill_date, bill_json, prices)
     return bill
 
 
 def create_service_bill(patient_name: str, bill_json: list[dict], total_amount: float, discount: float, net_amount: float, payment_type: str, bill_date: datetime) -> ServiceBill:
-    service_bill = ServiceBill(patient_name, json.dumps(bill_json), total_amount, discount, net_amount, payment_type, bill_date)
-    session.add(service_bill)
-    session.commit()
+    with transaction():
+        service_bill = ServiceBill(patient_name, json.dumps(bill_json), total_amount, discount, net_amount, payment_type, bill_date)
+        session.add(service_bill)
+        add_to_daily_sales("service_bill", bill_date, payment_type, total_amount, discount, net_amount)
     return service_bill
 
 
+def import_stock(rows: list[dict]) -> dict:
+    # All rows are checked before anything is written, one bad row imports nothing.
+    # Rows for the same batch are added together, existing batches get the quantity
+    # added like create_batch does, and new items are created like create_item_and_batch.
+    snapshot_stock()
+    errors, items, batches = list(), dict(), dict()
+    for index, row in enumerate(rows):
+        line, message = parse_stock_row(row)
+        if message is not None:
+            errors.append({"row": row.get("row", index + 1), "message": message})
+            continue
+        code = re.sub('[^A-Za-z0-9]+', '', line.get("name")).lower()
+        if not code:
+            errors.append({"row": row.get("row", index + 1), "message": f"{line.get('name')} has no letters or digits."})
+            continue
+        if code not in items:
+            best_before = relativedelta.relativedelta(line.get("exp_date"), line.get("mfg_date"))
+            items[code] = {"code": code, "name": line.get("name"), "price": line.get("price"), "life_cycle": best_before.months + (best_before.years * 12)}
+        batch = batches.setdefault((code, line.get("batch_no")), {"item_code": code, "batch_no": line.get("batch_no"), "quantity": 0})
+        batch.update(quantity=batch.get("quantity") + line.get("quantity"), price=line.get("price"), mfg_date=line.get("mfg_date"), exp_date=line.get("exp_date"))
+    if errors:
+        return {"items": 0, "batches": 0, "errors": errors}
+    if not batches:
+        return {"items": 0, "batches": 0, "errors": [{"row": None, "message": "There is nothing to import."}]}
+
+    with transaction():
+        existing = {code for code, in session.query(Item.code).filter(Item.code.in_(list(items)))}
+        new_items = [item for code, item in items.items() if code not in existing]
+        if new_items:
+            session.execute(insert(Item.__table__), new_items)
+        session.execute(receive_batch, list(batches.values()))
+        record_movements("receipt", list(batches.values()))
+        expire_batches(set(batches))
+        refresh_expiry_buckets(list(items))
+    for item in new_items:
+        catalogue.put({"code": item.get("code"), "name": item.get("name"), "price": str(item.get("price")), "life_cycle": str(item.get("life_cycle"))})
+    return {"items": len(new_items), "batches": len(batches), "errors": list()}
+
+
 def edit_item(code: str, name: str, price: float, life_cycle: int) -> Item | str:
-    item = session.query(Item).filter(Item.code == code).scalar()
-    if item is None:
-        return f"{code} doesn't exist."
-    item.name = name
-    item.price = price
-    item.life_cycle = life_cycle
-    session.commit()
+    with transaction():
+        item = session.query(Item).filter(Item.code == code).scalar()
+        if item is None:
+            return f"{code} doesn't exist."
+        item.name = name
+        item.price = price
+        item.life_cycle = life_cycle
+    catalogue.put(item_dict(item))
     return item
 
 
 def edit_batch(item_code: str, batch_no: str, quantity: int, price: float, mfg_date: date, exp_date: date) -> Batch | str:
-    batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
-    if batch is None:
-        return f"{batch_no} doesn't exist."
-    if quantity == 0:
-        session.delete(batch)
-    else:
-        batch.quantity = quantity
+    snapshot_stock()
+    with transaction():
+        if set_batch_quantity(item_code, batch_no, quantity) is None:
+            return f"{batch_no} doesn't exist."
+        batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
         batch.price = price
         batch.mfg_date = mfg_date.replace(day=1)
         batch.exp_date = exp_date.replace(day=1)
-    session.commit()
+        refresh_expiry_buckets([item_code])
     return batch
 
 
 def delete_item(code: str) -> str | None:
-    item = session.query(Item).filter(Item.code == code).scalar()
-    if item is None:
-        return f"{code} doesn't exist."
-    session.delete(item)
-    session.commit()
+    snapshot_stock()
+    with transaction():
+        item = session.query(Item).filter(Item.code == code).scalar()
+        if item is None:
+            return f"{code} doesn't exist."
+        for batch_no, in session.query(Batch.batch_no).filter(Batch.item_code == code).all():
+            set_batch_quantity(code, batch_no, 0)
+        session.delete(item)
+        refresh_expiry_buckets([code])
+    catalogue.remove(code)
 
 
 def delete_batch(item_code: str, batch_no: str) -> str | None:
-    batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
-    if batch is None:
-        return f"{batch_no} doesn't exist."
-    session.delete(batch)
-    session.commit()
+    snapshot_stock()
+    with transaction():
+        # The row stays with quantity 0 so the batch can still be returned to or restocked.
+        if set_batch_quantity(item_code, batch_no, 0) is None:
+            return f"{batch_no} doesn't exist."
+        refresh_expiry_buckets([item_code])
+
+
+def return_stock(item_code: str, batch_no: str, quantity: int, bill_id: int | None = None) -> Batch | str:
+    snapshot_stock()
+    if quantity <= 0:
+        return "Returned quantity has to be above 0."
+    with transaction():
+        parameters = {"line_item_code": item_code, "line_batch_no": batch_no, "line_quantity": quantity}
+        if session.connection().execute(restore_batch, parameters).rowcount == 0:
+            return f"{batch_no} doesn't exist."
+        expire_batches({(item_code, batch_no)})
+        record_movements("return", [{"item_code": item_code, "batch_no": batch_no, "quantity": quantity}], bill_id)
+        refresh_expiry_buckets([item_code])
+        batch = session.query(Batch).filter(Batch.batch_no == batch_no, Batch.item_code == item_code).scalar()
+    return batch
 
 
 def create_item_and_batch(name: str, batch_no: str, quantity: int, price: float, mfg_date: date, exp_date: date) -> tuple[Item, Batch]:
     code = re.sub('[^A-Za-z0-9]+', '', name).lower()
-    item = session.query(Item).filter(Item.code == code).scalar()
-    if item is None:
-        best_before = relativedelta.relativedelta(exp_date, mfg_date)
-        item = Item(code, name, price, (best_before.months + (best_before.years * 12)))
-        session.add(item)
-        session.commit()
-    batch = create_batch(code, batch_no, quantity, price, mfg_date, exp_date)
+    with transaction():
+        item = session.query(Item).filter(Item.code == code).scalar()
+        created = item is None
+        if created:
+            best_before = relativedelta.relativedelta(exp_date, mfg_date)
+            item = Item(code, name, price, (best_before.months + (best_before.years * 12)))
+            session.add(item)
+        batch = create_batch(code, batch_no, quantity, price, mfg_date, exp_date)
+    if created:
+        catalogue.put(item_dict(item))
     return item, batch
@@ -0,0 +1,35 @@
+import os
+import time
+import tempfile
+import statistics
+
+
+def use_temporary_database() -> str:
+    # models.py opens "mydb.db" relative to the working directory on import,
+    # so this has to run before anything imports models or backend.
+    directory = tempfile.mkdtemp(prefix="pharmacy_bench_")
+    os.chdir(directory)
+    return directory
+
+
+def timed(function, repeat: int = 5) -> float:
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def print_table(headers: list[str], rows: list[list]):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    print("  ".join(str(header).rjust(width) for header, width in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+
+def check(conditions: dict[str, bool]):
+    # The stress benchmarks double as correctness checks, any failed one exits non-zero.
+    failed = [name for name, passed in conditions.items() if not passed]
+    if failed:
+        raise SystemExit(f"FAILED: {', '.join(failed)}")
@@ -0,0 +1,74 @@
+"""Bill commit latency against line count, per-line lookups vs. one bulk fetch.
+
+The legacy path only writes the bill and the batches. create_bill also writes the bill lines,
+the stock ledger and the rollups, so it is slower for bills of a line or two.
+
+Run from the repository root:  python -m benchmarks.create_bill
+"""
+import json
+from datetime import date, datetime
+
+from benchmarks import use_temporary_database, timed, print_table
+
+use_temporary_database()
+
+from models import session, Item, Batch, Bill  # noqa: E402
+from backend import create_bill  # noqa: E402
+
+LINE_COUNTS = [1, 10, 50, 200]
+STOCK = 10 ** 9
+
+
+def legacy_create_bill(customer_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date):
+    bill = Bill(customer_name, json.dumps(bill_json), total_amount, discount, net_amount, payment_type, bill_date)
+    session.add(bill)
+    for batch_dict in bill_json:
+        batch = session.query(Batch).filter(Batch.batch_no == batch_dict["batch_no"], Batch.item_code == batch_dict["item_code"]).scalar()
+        if batch is None:
+            continue
+        if batch.quantity <= batch_dict["quantity"]:
+            session.delete(batch)
+        else:
+            batch.quantity -= batch_dict["quantity"]
+    session.commit()
+    return bill
+
+
+def seed(count: int):
+    for i in range(count):
+        session.add(Item(f"item{i:05d}", f"Item {i:05d}", 10.0, 24))
+        for j in range(5):
+            session.add(Batch(f"item{i:05d}", f"B{j}", STOCK, 10.0, date(2024, 1, 1), date(2030, 1, 1)))
+    session.commit()
+
+
+def bill_lines(count: int) -> list[dict]:
+    return [{
+        "item_code": f"item{i:05d}",
+        "item_name": f"Item {i:05d}",
+        "batch_no": f"B{i % 5}",
+        "mfg_date": "01/2024",
+        "exp_date": "01/2030",
+        "quantity": 1,
+        "price": 10.0,
+        "total": 10.0,
+    } for i in range(count)]
+
+
+def main():
+    seed(max(LINE_COUNTS))
+    rows = list()
+    for count in LINE_COUNTS:
+        lines = bill_lines(count)
+        before = timed(lambda: legacy_create_bill("bench", lines, 10.0 * count, 0, 10.0 * count, "Cash", datetime.now()))
+        after = timed(lambda: create_bill("bench", lines, 10.0 * count, 0, 10.0 * count, "Cash", datetime.now()))
+        rows.append([count, f"{before * 1000:.2f}", f"{after * 1000:.2f}", f"{before / after:.1f}x"])
+    print_table(["lines", "before (ms)", "after (ms)", "speedup"], rows)
+    print(
+        "\nafter also writes bill_line, stock_movement, daily_sales, item_daily_sales, item_velocity and expiry_bucket,"
+        "\nwhich before doesn't, so 1-line bills are slower than before."
+    )
+
+
+if __name__ == "__main__":
+    main()
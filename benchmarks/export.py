@@ -0,0 +1,91 @@
+"""Export timings for a database of a million bill lines.
+
+Run from the repository root:  python -m benchmarks.export [bill_lines]
+"""
+import sys
+import json
+import time
+import random
+import resource
+from datetime import date, datetime, timedelta
+
+from benchmarks import use_temporary_database, print_table
+
+use_temporary_database()
+
+from models import session, Item, Batch, Bill, BillLine  # noqa: E402
+from db_exporter import TABLES, WRITERS, export_table  # noqa: E402
+
+LINES_PER_BILL = 10
+ITEM_COUNT = 2000
+
+
+def peak_rss_mb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def seed(line_count: int):
+    randomizer = random.Random(1)
+    session.execute(Item.__table__.insert(), [
+        {"code": f"item{i:05d}", "name": f"Item, number {i}", "price": 10.0, "life_cycle": 12} for i in range(ITEM_COUNT)
+    ])
+    session.execute(Batch.__table__.insert(), [
+        {"item_code": f"item{i:05d}", "batch_no": f"B{j}", "quantity": 100, "price": 10.0, "mfg_date": date(2024, 1, 1), "exp_date": date(2030, 1, 1)}
+        for i in range(ITEM_COUNT) for j in range(3)
+    ])
+    start = datetime(2024, 1, 1)
+    bill_count = line_count // LINES_PER_BILL
+    for first in range(0, bill_count, 10000):
+        bills, lines = list(), list()
+        for bill_id in range(first + 1, min(first + 10000, bill_count) + 1):
+            bill_lines = [{
+                "bill_id": bill_id, "item_code": f"item{randomizer.randrange(ITEM_COUNT):05d}", "batch_no": "B0",
+                "quantity": 1, "price": 10.0, "total": 10.0,
+            } for _ in range(LINES_PER_BILL)]
+            lines.extend(bill_lines)
+            bills.append({
+                "id": bill_id, "name": f"Customer {bill_id}", "bill_json": json.dumps(bill_lines), "total_amount": 100.0,
+                "discount": 0.0, "net_amount": 100.0, "payment_type": "Cash", "bill_date": start + timedelta(minutes=bill_id),
+            })
+        session.execute(Bill.__table__.insert(), bills)
+        session.execute(BillLine.__table__.insert(), lines)
+    session.commit()
+    session.remove()
+
+
+def legacy_bill_lines():
+    # What db_exporter.py did for items and batches: load everything, then join strings.
+    with open("bill_lines.txt", "w") as f:
+        for line in session.query(BillLine).order_by(BillLine.id).all():
+            f.write(f"{line.bill_id}, {line.item_code}, {line.batch_no}, {line.quantity}, {line.price}, {line.total}\n")
+    session.remove()
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    seed(line_count)
+    row_count = sum(session.query(model).count() for model in TABLES.values())
+    session.remove()
+    print(f"{row_count} rows, peak RSS after seeding {peak_rss_mb()} MB\n")
+
+    rows = list()
+    for output_format in WRITERS:
+        start = time.perf_counter()
+        try:
+            for name in TABLES:
+                export_table(name, output_format)
+        except SystemExit as error:
+            rows.append([output_format, "-", "-", str(error)])
+            continue
+        elapsed = time.perf_counter() - start
+        rows.append([output_format, f"{elapsed:.2f}", f"{row_count / elapsed:,.0f}", peak_rss_mb()])
+
+    start = time.perf_counter()
+    legacy_bill_lines()
+    elapsed = time.perf_counter() - start
+    rows.append(["old .all(), bill_lines only", f"{elapsed:.2f}", f"{line_count / elapsed:,.0f}", peak_rss_mb()])
+    print_table(["format", "seconds", "rows/s", "peak RSS (MB)"], rows)
+
+
+if __name__ == "__main__":
+    main()
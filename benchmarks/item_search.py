@@ -0,0 +1,57 @@
+"""Bill entry item lookup over 20k SKUs: chained LIKE '%word%' filters vs. the in-process index.
+
+Run from the repository root:  python -m benchmarks.item_search
+"""
+import random
+import time
+
+from benchmarks import use_temporary_database, timed, print_table
+
+use_temporary_database()
+
+from sqlalchemy import insert  # noqa: E402
+from models import session, Item  # noqa: E402
+from backend import get_items, get_catalogue, search_items  # noqa: E402
+
+ITEM_COUNT = 20_000
+QUERIES = ["paracetamol 500", "amox", "cetiri", "vit d", "ome 20", "xyz"]
+# One name in twenty is a real generic so every query above, except "xyz", has matches.
+GENERICS = ["Paracetamol", "Amoxicillin", "Cetirizine", "Vitamin D3", "Omeprazole", "Metformin", "Azithromycin", "Pantoprazole"]
+SYLLABLES = ["para", "ceta", "mol", "amo", "xi", "cil", "lin", "ome", "pra", "zole", "vit", "cetiri", "zine", "met", "for", "min"] + [
+    consonant + vowel for consonant in "bcdfghklmnprstvz" for vowel in "aeiou"
+]
+
+
+def seed():
+    random.seed(0)
+    names = set()
+    while len(names) < ITEM_COUNT // 20:
+        maker = "".join(random.choice(SYLLABLES) for _ in range(2)).capitalize()
+        names.add(f"{random.choice(GENERICS)} {random.choice([5, 10, 20, 250, 500, 650])}mg {maker}")
+    while len(names) < ITEM_COUNT:
+        word = "".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))).capitalize()
+        names.add(f"{word} {random.choice([5, 10, 20, 250, 500, 650])}mg")
+    session.execute(insert(Item), [{
+        "code": "".join(character for character in name if character.isalnum()).lower(),
+        "name": name,
+        "price": 10.0,
+        "life_cycle": 24,
+    } for name in names])
+    session.commit()
+
+
+def main():
+    seed()
+    start = time.perf_counter()
+    get_catalogue()
+    print(f"index build: {(time.perf_counter() - start) * 1000:.0f} ms for {ITEM_COUNT} items\n")
+    rows = list()
+    for query in QUERIES:
+        before = timed(lambda: get_items(code_list=query.split()), repeat=20)
+        after = timed(lambda: search_items(query), repeat=200)
+        rows.append([query, len(search_items(query)), f"{before * 1000:.3f}", f"{after * 1000:.3f}"])
+    print_table(["query", "results", "LIKE (ms)", "index (ms)"], rows)
+
+
+if __name__ == "__main__":
+    main()
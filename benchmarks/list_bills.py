@@ -0,0 +1,70 @@
+"""Listing 100k stored bills: full ORM rows with decoded bill_json vs. header columns only.
+
+Run from the repository root:  python -m benchmarks.list_bills
+"""
+import json
+from datetime import datetime, timedelta
+
+from benchmarks import use_temporary_database, timed, print_table
+
+use_temporary_database()
+
+from sqlalchemy import insert  # noqa: E402
+from models import session, Bill  # noqa: E402
+from backend import get_bills  # noqa: E402
+
+BILL_COUNT = 100_000
+LINES_PER_BILL = 5
+
+
+def legacy_get_bills() -> list[dict]:
+    bills = session.query(Bill).order_by(Bill.bill_date.desc(), Bill.id.desc())
+    return [{
+        "id": str(bill.id),
+        "customer_name": bill.customer_name,
+        "bill_json": json.loads(bill.bill_json),
+        "total_amount": str(bill.total_amount),
+        "discount": str(bill.discount),
+        "net_amount": str(bill.net_amount),
+        "payment_type": bill.payment_type,
+        "bill_date": bill.bill_date.strftime("%Y-%m-%d %H:%M:%S"),
+    } for bill in bills]
+
+
+def seed():
+    lines = json.dumps([{
+        "item_code": f"item{i}",
+        "item_name": f"Item {i}",
+        "batch_no": "B1",
+        "mfg_date": "01/2024",
+        "exp_date": "01/2026",
+        "quantity": 2,
+        "price": 10.0,
+        "total": 20.0,
+    } for i in range(LINES_PER_BILL)])
+    start = datetime(2023, 1, 1)
+    session.execute(insert(Bill), [{
+        "customer_name": f"Customer {i}",
+        "bill_json": lines,
+        "total_amount": 100.0,
+        "discount": 0.0,
+        "net_amount": 100.0,
+        "payment_type": "Cash",
+        "bill_date": start + timedelta(minutes=5 * i),
+    } for i in range(BILL_COUNT)])
+    session.commit()
+
+
+def main():
+    seed()
+    before = timed(legacy_get_bills, repeat=3)
+    session.expunge_all()
+    after = timed(get_bills, repeat=3)
+    print_table(
+        ["bills", "before (ms)", "after (ms)", "speedup"],
+        [[BILL_COUNT, f"{before * 1000:.0f}", f"{after * 1000:.0f}", f"{before / after:.1f}x"]]
+    )
+
+
+if __name__ == "__main__":
+    main()
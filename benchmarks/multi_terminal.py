@@ -0,0 +1,85 @@
+"""N simulated counters billing through one local server.py instance.
+
+Run from the repository root:  python -m benchmarks.multi_terminal [counters ...]
+"""
+import sys
+import time
+import threading
+import statistics
+from datetime import date, datetime
+
+from benchmarks import use_temporary_database, print_table, check
+
+use_temporary_database()
+
+import client  # noqa: E402
+from server import create_server  # noqa: E402
+from backend import create_item_and_batch  # noqa: E402
+from models import session, Batch, BillLine  # noqa: E402
+
+BILLS_PER_COUNTER = 100
+ITEM_COUNT = 20
+STOCK = 10 ** 6
+
+
+def counter(counter_no: int, latencies: list[float]):
+    for i in range(BILLS_PER_COUNTER):
+        lines = [{
+            "item_code": f"item{(counter_no + i + j) % ITEM_COUNT:02d}",
+            "item_name": "Item",
+            "batch_no": "B1",
+            "quantity": 1,
+            "price": 10.0,
+            "total": 10.0,
+        } for j in range(3)]
+        start = time.perf_counter()
+        client.create_bill(f"Counter {counter_no}", lines, 30.0, 0, 30.0, "Cash", datetime.now())
+        latencies.append(time.perf_counter() - start)
+
+
+def main():
+    counter_counts = [int(argument) for argument in sys.argv[1:]] or [1, 2, 4, 8]
+    for i in range(ITEM_COUNT):
+        create_item_and_batch(f"Item {i:02d}", "B1", STOCK, 10.0, date(2024, 1, 1), date(2030, 1, 1))
+    session.remove()
+
+    server = create_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client.connect(f"http://127.0.0.1:{server.server_address[1]}")
+
+    rows = list()
+    sold = 0
+    for counters in counter_counts:
+        latencies: list[float] = list()
+        threads = [threading.Thread(target=counter, args=(counter_no, latencies)) for counter_no in range(counters)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        sold += counters * BILLS_PER_COUNTER * 3
+        latencies.sort()
+        rows.append([
+            counters,
+            f"{counters * BILLS_PER_COUNTER / elapsed:.0f}",
+            f"{statistics.median(latencies) * 1000:.1f}",
+            f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f}",
+        ])
+    print_table(["counters", "bills/s", "p50 (ms)", "p95 (ms)"], rows)
+
+    server.shutdown()
+    remaining = sum(batch.quantity for batch in session.query(Batch))
+    missing = ITEM_COUNT * STOCK - remaining
+    billed = sum(line.quantity for line in session.query(BillLine))
+    negative = session.query(Batch).filter(Batch.quantity < 0).count()
+    print(f"\nunits sold {sold}, units billed {billed}, units missing from stock {missing}")
+    check({
+        "every unit sold was billed": billed == sold,
+        "units missing from stock equal units sold": missing == sold,
+        "no negative batches": negative == 0,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Bills rendered per second, the old python-docx round trip against the cached template.
+
+Run from the repository root:  python -m benchmarks.print_bills
+"""
+import os
+import json
+import shutil
+import time
+from types import SimpleNamespace
+from datetime import datetime
+
+from benchmarks import use_temporary_database, print_table
+
+REPOSITORY = os.getcwd()
+directory = use_temporary_database()
+for template in ("bill_sample.docx", "service_bill_sample.docx"):
+    shutil.copy(os.path.join(REPOSITORY, template), template)
+
+from printing import RENDERERS, FileSink, print_bill  # noqa: E402
+
+BILLS = 200
+
+
+def make_bill(bill_id: int, line_count: int = 8) -> SimpleNamespace:
+    lines = [{
+        "item_name": f"Item number {i}",
+        "batch_no": f"B{i:04d}",
+        "exp_date": "01/2030",
+        "quantity": i + 1,
+        "price": 12.5,
+        "total": 12.5 * (i + 1),
+    } for i in range(line_count)]
+    total = sum(line["total"] for line in lines)
+    return SimpleNamespace(
+        id=bill_id, bill_date=datetime.now(), customer_name="Customer", total_amount=total,
+        discount=0.0, net_amount=total, payment_type="Cash", bill_json=json.dumps(lines),
+    )
+
+
+def legacy_print(bill):
+    from docx import Document
+
+    document = Document("bill_sample.docx")
+    items = ""
+    for i, item in enumerate(json.loads(bill.bill_json)):
+        items += f"{i:02d}  {item['item_name']}\t{item['batch_no']}\t{item['exp_date']}\t{item['quantity']}\t{item['price']:.2f}\t{item['total']:.2f}\n"
+    replacement_dictionary = {
+        "[----]": f"[{bill.id:04d}]",
+        "DD/MM/YYYY": bill.bill_date.strftime("%d/%m/%Y"),
+        "[Customer Name]": bill.customer_name,
+        "[Bill]": "\n" + items,
+        "[TTTTT.00]": f"{bill.total_amount:8.2f}",
+        "[DDDDD.00]": f"{bill.discount:8.2f}",
+        "[NNNNN.00]": f"{bill.net_amount:8.2f}",
+        "[PPPPPPPPPPP]": f"[{bill.payment_type}]".rjust(11),
+    }
+    for paragraph in document.paragraphs:
+        for old_string, new_string in replacement_dictionary.items():
+            if old_string in paragraph.text:
+                for run in paragraph.runs:
+                    if old_string in run.text:
+                        run.text = run.text.replace(old_string, new_string)
+    document.save("bill_output.docx")
+
+
+def bills_per_second(function, bills: list) -> float:
+    start = time.perf_counter()
+    for bill in bills:
+        function(bill)
+    return len(bills) / (time.perf_counter() - start)
+
+
+def main():
+    bills = [make_bill(i) for i in range(1, BILLS + 1)]
+    rows = [["python-docx (old)", f"{bills_per_second(legacy_print, bills[:50]):.0f}"]]
+    for output_format, (_, extension) in RENDERERS.items():
+        sink = FileSink(f"bill_output.{extension}")
+        rows.append([output_format, f"{bills_per_second(lambda bill: print_bill(bill, output_format=output_format, sink=sink), bills):.0f}"])
+    print_table(["output", "bills/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
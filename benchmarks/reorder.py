@@ -0,0 +1,94 @@
+"""Reorder suggestions from the item_velocity rollup vs. parsing every bill_json of the last 90 days.
+
+Run from the repository root:  python -m benchmarks.reorder [bill_lines]
+"""
+import sys
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+from benchmarks import use_temporary_database, timed, print_table
+
+use_temporary_database()
+
+from models import session, Item, Batch, Bill, BillLine  # noqa: E402
+from migrations import rebuild_item_daily_sales_at_sale_cost, rebuild_item_velocity  # noqa: E402
+from backend import get_reorder_suggestions, get_fast_movers, create_bill  # noqa: E402
+from replenishment import reorder_line  # noqa: E402
+
+ITEM_COUNT = 5000
+LINES_PER_BILL = 10
+DAYS = 90
+
+
+def seed(line_count: int):
+    randomizer = random.Random(1)
+    session.execute(Item.__table__.insert(), [
+        {"code": f"item{i:05d}", "name": f"Item {i:05d}", "price": 10.0, "life_cycle": 24} for i in range(ITEM_COUNT)
+    ])
+    session.execute(Batch.__table__.insert(), [
+        {"item_code": f"item{i:05d}", "batch_no": "B0", "quantity": randomizer.randint(0, 400), "price": 10.0, "mfg_date": date(2024, 1, 1), "exp_date": date(2030, 1, 1)}
+        for i in range(ITEM_COUNT)
+    ])
+    # A few items sell far more than the rest, like they do at a counter.
+    weights = [1 / (i + 1) for i in range(ITEM_COUNT)]
+    bill_count = line_count // LINES_PER_BILL
+    now = datetime.now()
+    for first in range(0, bill_count, 10000):
+        bills, lines = list(), list()
+        for bill_id in range(first + 1, min(first + 10000, bill_count) + 1):
+            bill_lines = [{
+                "bill_id": bill_id, "item_code": f"item{i:05d}", "batch_no": "B0", "quantity": 1, "price": 10.0, "total": 10.0, "cost": 10.0,
+            } for i in randomizer.choices(range(ITEM_COUNT), weights, k=LINES_PER_BILL)]
+            lines.extend(bill_lines)
+            bills.append({
+                "id": bill_id, "name": "bench", "bill_json": json.dumps(bill_lines), "total_amount": 100.0, "discount": 0.0,
+                "net_amount": 100.0, "payment_type": "Cash", "bill_date": now - timedelta(days=DAYS * bill_id / bill_count),
+            })
+        session.execute(Bill.__table__.insert(), bills)
+        session.execute(BillLine.__table__.insert(), lines)
+    rebuild_item_daily_sales_at_sale_cost(session.connection())
+    rebuild_item_velocity(session.connection())
+    session.commit()
+
+
+def legacy_reorder_suggestions(lead_days: int = 7, cover_days: int = 30) -> list[tuple]:
+    # Without the rollup: every bill of the last 90 days, its bill_json parsed line by line.
+    today = date.today()
+    since = datetime.combine(today - timedelta(days=DAYS - 1), time.min)
+    sold: dict[str, list[int]] = dict()
+    for bill_date, bill_json in session.query(Bill.bill_date, Bill.bill_json).filter(Bill.bill_date >= since):
+        age = (today - bill_date.date()).days
+        for line in json.loads(bill_json):
+            windows = sold.setdefault(line.get("item_code"), [0, 0, 0])
+            for index, days in enumerate((7, 30, 90)):
+                if age < days:
+                    windows[index] += line.get("quantity")
+    on_hand = dict(session.query(Batch.item_code, Batch.quantity).filter(Batch.quantity > 0))
+    suggestions = list()
+    for item_code, (sold_7, sold_30, _) in sold.items():
+        line = reorder_line(sold_7, sold_30, on_hand.get(item_code, 0), lead_days, cover_days)
+        if line.get("reorder"):
+            suggestions.append((line.get("days_left"), item_code))
+    return sorted(suggestions)
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    seed(line_count)
+    print(f"{ITEM_COUNT} items, {line_count} bill lines over {DAYS} days\n")
+    suggestions = get_reorder_suggestions()
+    assert sorted(code for _, code in legacy_reorder_suggestions()) == sorted(row.get("code") for row in suggestions)
+    print(f"{len(suggestions)} items to reorder\n")
+    rows = [
+        ["reorder suggestions, parsing bill_json", f"{timed(legacy_reorder_suggestions, 3) * 1000:.1f}"],
+        ["reorder suggestions, item_velocity", f"{timed(get_reorder_suggestions) * 1000:.1f}"],
+        ["top 20 fast movers", f"{timed(get_fast_movers) * 1000:.1f}"],
+    ]
+    lines = [{"item_code": f"item{i:05d}", "batch_no": "B0", "quantity": 0, "price": 10.0, "total": 0.0} for i in range(LINES_PER_BILL)]
+    rows.append([f"create_bill with {LINES_PER_BILL} lines", f"{timed(lambda: create_bill('bench', lines, 0, 0, 0, 'Cash', datetime.now())) * 1000:.1f}"])
+    print_table(["", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Reports over a year of bills, one SQL query each vs. the per-day and per-bill Python loops they replace.
+
+Run from the repository root:  python -m benchmarks.reports [bill_lines]
+"""
+import sys
+import json
+import random
+from datetime import date, datetime, timedelta
+
+from benchmarks import use_temporary_database, timed, print_table
+
+use_temporary_database()
+
+from models import session, Item, Batch, Bill, BillLine  # noqa: E402
+from migrations import rebuild_daily_sales, rebuild_item_daily_sales_at_sale_cost  # noqa: E402
+from backend import get_bills, day_range  # noqa: E402
+from reports import get_sales_by_period, get_sales_by_payment_type, get_top_items, get_discount_report, get_gross_margin  # noqa: E402
+
+ITEM_COUNT = 5000
+LINES_PER_BILL = 10
+START = date(2024, 1, 1)
+DAYS = 366
+
+
+def seed(line_count: int):
+    randomizer = random.Random(1)
+    session.execute(Item.__table__.insert(), [
+        {"code": f"item{i:05d}", "name": f"Item {i:05d}", "price": 10.0, "life_cycle": 24} for i in range(ITEM_COUNT)
+    ])
+    prices = {f"item{i:05d}": randomizer.uniform(1, 100) for i in range(ITEM_COUNT)}
+    session.execute(Batch.__table__.insert(), [
+        {"item_code": code, "batch_no": "B0", "quantity": 100, "price": price, "mfg_date": date(2023, 1, 1), "exp_date": date(2030, 1, 1)}
+        for code, price in prices.items()
+    ])
+    bill_count = line_count // LINES_PER_BILL
+    start = datetime.combine(START, datetime.min.time())
+    for first in range(0, bill_count, 10000):
+        bills, lines = list(), list()
+        for bill_id in range(first + 1, min(first + 10000, bill_count) + 1):
+            bill_lines = list()
+            for _ in range(LINES_PER_BILL):
+                code = f"item{randomizer.randrange(ITEM_COUNT):05d}"
+                quantity = randomizer.randint(1, 3)
+                price = round(prices[code] * randomizer.uniform(1.0, 1.3), 2)
+                bill_lines.append({
+                    "bill_id": bill_id, "item_code": code, "batch_no": "B0", "quantity": quantity, "price": price, "total": quantity * price,
+                    "cost": prices[code],
+                })
+            lines.extend(bill_lines)
+            total = sum(line.get("total") for line in bill_lines)
+            discount = round(total * 0.05, 2) if randomizer.random() < 0.2 else 0.0
+            bills.append({
+                "id": bill_id, "name": "bench", "bill_json": json.dumps(bill_lines), "total_amount": total, "discount": discount,
+                "net_amount": total - discount, "payment_type": randomizer.choice(["Cash", "Card", "UPI"]),
+                "bill_date": start + timedelta(days=DAYS * (bill_id - 1) / bill_count),
+            })
+        session.execute(Bill.__table__.insert(), bills)
+        session.execute(BillLine.__table__.insert(), lines)
+    rebuild_daily_sales(session.connection())
+    rebuild_item_daily_sales_at_sale_cost(session.connection())
+    session.commit()
+
+
+def legacy_monthly_sales() -> dict:
+    # How the bills page adds up a day, done for every day of the year.
+    months: dict[str, float] = dict()
+    for offset in range(DAYS):
+        day = START + timedelta(days=offset)
+        net = sum(float(bill.get("net_amount")) for bill in get_bills(*day_range(day)))
+        months[day.strftime("%Y-%m")] = months.get(day.strftime("%Y-%m"), 0.0) + net
+    return months
+
+
+def legacy_monthly_margin() -> dict:
+    # Every bill_json parsed and every line costed against a dict of batch prices.
+    prices = {(batch.item_code, batch.batch_no): batch.price for batch in session.query(Batch)}
+    months: dict[str, float] = dict()
+    for bill_date, bill_json in session.query(Bill.bill_date, Bill.bill_json):
+        month = bill_date.strftime("%Y-%m")
+        for line in json.loads(bill_json):
+            cost = line.get("quantity") * prices.get((line.get("item_code"), line.get("batch_no")), 0.0)
+            months[month] = months.get(month, 0.0) + line.get("total") - cost
+    return months
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    seed(line_count)
+    session.remove()
+    print(f"{line_count} bill lines, {line_count // LINES_PER_BILL} bills over {DAYS} days\n")
+
+    sales = {row.get("period"): float(row.get("net")) for row in get_sales_by_period(period="month")}
+    assert all(abs(sales[month] - net) < 1 for month, net in legacy_monthly_sales().items())
+    margin = {row.get("month"): float(row.get("margin")) for row in get_gross_margin()}
+    assert all(abs(margin[month] - value) < 1 for month, value in legacy_monthly_margin().items())
+
+    rows = [
+        ["sales by month, get_bills per day", f"{timed(legacy_monthly_sales, 1) * 1000:.1f}"],
+        ["sales by month, reports", f"{timed(lambda: get_sales_by_period(period='month')) * 1000:.1f}"],
+        ["sales by day, reports", f"{timed(lambda: get_sales_by_period(period='day')) * 1000:.1f}"],
+        ["sales by week, reports", f"{timed(lambda: get_sales_by_period(period='week')) * 1000:.1f}"],
+        ["sales by payment type", f"{timed(get_sales_by_payment_type) * 1000:.1f}"],
+        ["top 20 items", f"{timed(get_top_items) * 1000:.1f}"],
+        ["discounts by month", f"{timed(get_discount_report) * 1000:.1f}"],
+        ["gross margin by month, bill_json loop", f"{timed(legacy_monthly_margin, 1) * 1000:.1f}"],
+        ["gross margin by month, reports", f"{timed(get_gross_margin, 3) * 1000:.1f}"],
+        ["gross margin by item, reports", f"{timed(lambda: get_gross_margin(group='item'), 3) * 1000:.1f}"],
+        ["gross margin for one month", f"{timed(lambda: get_gross_margin(date(2024, 6, 1), date(2024, 7, 1))) * 1000:.1f}"],
+    ]
+    print_table(["", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
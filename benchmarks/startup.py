@@ -0,0 +1,52 @@
+"""Time from process start to the billing screen being painted.
+
+Run from the repository root:  python -m benchmarks.startup [items]
+"""
+import os
+import sys
+import time
+import shutil
+import statistics
+import subprocess
+
+from benchmarks import use_temporary_database, print_table
+
+REPOSITORY = os.getcwd()
+use_temporary_database()
+shutil.copytree(os.path.join(REPOSITORY, "UI"), "UI", ignore=shutil.ignore_patterns("compiled"))
+
+RUNS = 5
+
+
+def launch() -> tuple[float, dict[str, float]]:
+    environment = dict(os.environ, STARTUP_TIMING="exit", QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [REPOSITORY, environment.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPOSITORY, "main.py")], env=environment, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    marks = dict()
+    for line in result.stderr.splitlines():
+        label, _, rest = line.rpartition(" ms  (")[0].rpartition("  ")
+        if label:
+            marks[label.strip()] = float(rest)
+    return elapsed, marks
+
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    subprocess.run([sys.executable, "-c", (
+        "from backend import import_stock; import_stock([{'name': f'Item number {i}', 'batch_no': 'B1', 'quantity': 10, "
+        f"'price': 1.0, 'mfg_date': '2024-01-01', 'exp_date': '2030-01-01'}} for i in range({item_count})])"
+    )], env=dict(os.environ, PYTHONPATH=REPOSITORY), check=True)
+
+    first_elapsed, first_marks = launch()
+    runs = [launch() for _ in range(RUNS)]
+    labels = list(first_marks)
+    rows = [[label, f"{first_marks[label]:.0f}", f"{statistics.median(marks[label] for _, marks in runs):.0f}"] for label in labels]
+    rows.append(["process exit", f"{first_elapsed * 1000:.0f}", f"{statistics.median(elapsed for elapsed, _ in runs) * 1000:.0f}"])
+    print(f"{item_count} items in the database\n")
+    print_table(["milestone", "first run, compiling UI (ms)", f"median of {RUNS} (ms)"], rows)
+
+
+if __name__ == "__main__":
+    main()
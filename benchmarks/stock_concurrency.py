@@ -0,0 +1,99 @@
+"""Several threads billing the same batches while others receive, return and edit stock,
+checking that no units are lost.
+
+Run from the repository root:  python -m benchmarks.stock_concurrency [threads]
+"""
+import sys
+import time
+import random
+import threading
+from datetime import date, datetime
+
+from benchmarks import use_temporary_database, print_table, check
+
+use_temporary_database()
+
+from backend import create_bill, create_item_and_batch, create_batch, return_stock, edit_batch, check_stock_ledger  # noqa: E402
+from models import session, Batch, BillLine, StockMovement  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+
+BILLS_PER_THREAD = 200
+CHANGES_PER_THREAD = 200
+ITEM_COUNT = 3
+STOCK = 2000
+
+
+def biller(seed: int, results: dict):
+    randomizer = random.Random(seed)
+    for _ in range(BILLS_PER_THREAD):
+        lines = [{
+            "item_code": f"item{randomizer.randrange(ITEM_COUNT)}",
+            "item_name": "Item",
+            "batch_no": "B1",
+            "quantity": randomizer.randint(1, 8),
+            "price": 10.0,
+            "total": 10.0,
+        } for _ in range(randomizer.randint(1, 3))]
+        bill = create_bill("Stress", lines, 0, 0, 0, "Cash", datetime.now())
+        with results["lock"]:
+            results["rejected" if isinstance(bill, list) else "billed"] += 1
+    session.remove()
+
+
+def stock_keeper(seed: int, results: dict):
+    # Receipts and returns add a known quantity, edits set one, the ledger records what
+    # each edit changed.
+    randomizer = random.Random(seed)
+    for _ in range(CHANGES_PER_THREAD):
+        item_code = f"item{randomizer.randrange(ITEM_COUNT)}"
+        quantity = randomizer.randint(1, 8)
+        kind = randomizer.choice(["received", "returned", "edits"])
+        if kind == "received":
+            create_batch(item_code, "B1", quantity, 10.0, date(2024, 1, 1), date(2030, 1, 1))
+        elif kind == "returned":
+            return_stock(item_code, "B1", quantity)
+        else:
+            edit_batch(item_code, "B1", randomizer.randint(0, STOCK // 4), 10.0, date(2024, 1, 1), date(2030, 1, 1))
+        with results["lock"]:
+            results[kind] += 1 if kind == "edits" else quantity
+    session.remove()
+
+
+def main():
+    thread_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    for i in range(ITEM_COUNT):
+        create_item_and_batch(f"Item {i}", "B1", STOCK, 10.0, date(2024, 1, 1), date(2030, 1, 1))
+    session.remove()
+
+    results = {"billed": 0, "rejected": 0, "received": 0, "returned": 0, "edits": 0, "lock": threading.Lock()}
+    threads = [threading.Thread(target=biller, args=(seed, results)) for seed in range(thread_count)]
+    threads += [threading.Thread(target=stock_keeper, args=(seed, results)) for seed in range(thread_count, thread_count + max(1, thread_count // 4))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    remaining = sum(batch.quantity for batch in session.query(Batch))
+    negative = session.query(Batch).filter(Batch.quantity < 0).count()
+    sold = sum(line.quantity for line in session.query(BillLine))
+    adjusted = session.query(func.coalesce(func.sum(StockMovement.quantity), 0)).filter(StockMovement.kind == "adjustment").scalar()
+    lost = ITEM_COUNT * STOCK + results["received"] + results["returned"] + adjusted - remaining - sold
+    print_table(
+        ["threads", "bills", "rejected", "edits", "seconds", "units sold", "received", "returned", "adjusted", "units left", "units lost", "negative batches"],
+        [[
+            len(threads), results["billed"], results["rejected"], results["edits"], f"{elapsed:.2f}", sold,
+            results["received"], results["returned"], adjusted, remaining, lost, negative,
+        ]],
+    )
+    check({
+        "no units lost": lost == 0,
+        "no negative batches": negative == 0,
+        "every bill billed or rejected": results["billed"] + results["rejected"] == thread_count * BILLS_PER_THREAD,
+        "stock ledger balances": not check_stock_ledger(),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Stock valuation and past stock levels, SQL aggregates and snapshots vs. Python loops and bill replay.
+
+Run from the repository root:  python -m benchmarks.valuation [items] [days]
+"""
+import sys
+import random
+from datetime import date, datetime, time, timedelta
+
+from benchmarks import use_temporary_database, timed, print_table
+
+use_temporary_database()
+
+import backend  # noqa: E402
+from models import session, Item, Batch, Bill, BillLine, StockSnapshot  # noqa: E402
+from backend import get_batches, get_stock_valuation, get_stock_value_by_item, get_stock_value_by_expiry_month, snapshot_stock  # noqa: E402
+
+BATCHES_PER_ITEM = 3
+LINES_PER_DAY = 2000
+
+
+def seed(item_count: int, day_count: int):
+    randomizer = random.Random(1)
+    today = date.today()
+    session.execute(Item.__table__.insert(), [
+        {"code": f"item{i:05d}", "name": f"Item {i:05d}", "price": 10.0, "life_cycle": 24} for i in range(item_count)
+    ])
+    batches = [{
+        "item_code": f"item{i:05d}", "batch_no": f"B{j}", "quantity": 10 ** 6, "price": randomizer.uniform(1, 100),
+        "mfg_date": date(2024, 1, 1), "exp_date": date(2025 + j, randomizer.randint(1, 12), 1),
+    } for i in range(item_count) for j in range(BATCHES_PER_ITEM)]
+    # A snapshot per day and the bills sold since, oldest first.
+    bill_id = 0
+    for offset in range(day_count, 0, -1):
+        day = today - timedelta(days=offset)
+        session.execute(StockSnapshot.__table__.insert(), [{
+            "snapshot_date": day - timedelta(days=1), "item_code": batch.get("item_code"), "batch_no": batch.get("batch_no"),
+            "quantity": batch.get("quantity"), "price": batch.get("price"), "exp_date": batch.get("exp_date"),
+        } for batch in batches])
+        lines = list()
+        for _ in range(LINES_PER_DAY // 10):
+            bill_id += 1
+            for batch in randomizer.sample(batches, 10):
+                batch["quantity"] -= 1
+                lines.append({"bill_id": bill_id, "item_code": batch.get("item_code"), "batch_no": batch.get("batch_no"), "quantity": 1, "price": 10.0, "total": 10.0})
+        session.execute(Bill.__table__.insert(), [{
+            "id": first, "name": "bench", "bill_json": "[]", "total_amount": 100.0, "discount": 0.0, "net_amount": 100.0,
+            "payment_type": "Cash", "bill_date": datetime.combine(day, time(12)),
+        } for first in range(bill_id - LINES_PER_DAY // 10 + 1, bill_id + 1)])
+        session.execute(BillLine.__table__.insert(), lines)
+    session.execute(Batch.__table__.insert(), batches)
+    session.commit()
+
+
+def legacy_valuation() -> float:
+    # The only way before: every batch row through get_batches and its "total" string.
+    return sum(float(row.get("total")) for row in get_batches())
+
+
+def replayed_stock(day: date) -> float:
+    # Past stock without snapshots: current stock plus everything sold after that day.
+    end = datetime.combine(day + timedelta(days=1), time.min)
+    sold = dict()
+    for line in session.query(BillLine).join(Bill).filter(Bill.bill_date >= end):
+        sold[(line.item_code, line.batch_no)] = sold.get((line.item_code, line.batch_no), 0) + line.quantity
+    return sum((batch.quantity + sold.get((batch.item_code, batch.batch_no), 0)) * batch.price for batch in session.query(Batch))
+
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    day_count = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    seed(item_count, day_count)
+    past = date.today() - timedelta(days=day_count // 2)
+    print(f"{item_count * BATCHES_PER_ITEM} batches, {day_count} daily snapshots, {day_count * LINES_PER_DAY} bill lines\n")
+    assert abs(replayed_stock(past) - get_stock_valuation(past).get("value")) < 1e-3 * replayed_stock(past)
+    rows = [
+        ["total value, get_batches loop", f"{timed(legacy_valuation, 3) * 1000:.1f}"],
+        ["total value, get_stock_valuation", f"{timed(get_stock_valuation) * 1000:.1f}"],
+        ["value by item", f"{timed(get_stock_value_by_item) * 1000:.1f}"],
+        ["value by expiry month", f"{timed(get_stock_value_by_expiry_month) * 1000:.1f}"],
+        [f"value on {past}, bill replay", f"{timed(lambda: replayed_stock(past), 3) * 1000:.1f}"],
+        [f"value on {past}, snapshot", f"{timed(lambda: get_stock_valuation(past)) * 1000:.1f}"],
+    ]
+
+    def take_snapshot():
+        backend.rolled_on.pop("stock_snapshot", None)
+        session.query(StockSnapshot).filter(StockSnapshot.snapshot_date >= date.today() - timedelta(days=1)).delete()
+        snapshot_stock()
+    rows.append(["nightly snapshot_stock", f"{timed(take_snapshot) * 1000:.1f}"])
+    print_table(["", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
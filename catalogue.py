@@ -0,0 +1,77 @@
+from threading import RLock
+from search import ItemSearchIndex
+
+MAX_CHANGES = 1000
+
+
+class ItemCatalogue:
+    def __init__(self):
+        self.items: dict[str, dict] | None = None
+        self.sorted_items: list[dict] | None = None
+        self.search_index = ItemSearchIndex()
+        self.version: int = 0
+        self.changes: list[tuple[int, str]] = list()
+        self.lock = RLock()
+
+    def load(self, items: list[dict]):
+        with self.lock:
+            self.items = {item.get("code"): item for item in items}
+            self.sorted_items = None
+            self.search_index.build([(item.get("code"), item.get("name")) for item in items])
+            self.version += 1
+            self.changes = list()
+
+    def invalidate(self):
+        with self.lock:
+            self.items = None
+            self.sorted_items = None
+
+    def is_loaded(self) -> bool:
+        with self.lock:
+            return self.items is not None
+
+    def get(self, code: str) -> dict | None:
+        with self.lock:
+            return self.items.get(code)
+
+    def values(self) -> list[dict]:
+        with self.lock:
+            if self.sorted_items is None:
+                self.sorted_items = [self.items[code] for code in sorted(self.items)]
+            return self.sorted_items
+
+    def search(self, text: str, limit: int) -> list[dict]:
+        with self.lock:
+            return [self.items[code] for code in self.search_index.search(text, limit)]
+
+    def put(self, item: dict):
+        with self.lock:
+            if self.items is None:
+                return None
+            self.items[item.get("code")] = item
+            self.search_index.add(item.get("code"), item.get("name"))
+            self.record_change(item.get("code"))
+
+    def remove(self, code: str):
+        with self.lock:
+            if self.items is None:
+                return None
+            self.items.pop(code, None)
+            self.search_index.remove(code)
+            self.record_change(code)
+
+    def record_change(self, code: str):
+        self.sorted_items = None
+        self.version += 1
+        self.changes.append((self.version, code))
+        if len(self.changes) > MAX_CHANGES:
+            self.changes = self.changes[-MAX_CHANGES:]
+
+    def changes_since(self, version: int) -> dict[str, dict | None] | None:
+        with self.lock:
+            # None means the caller is too far behind and has to reload everything.
+            if version == self.version:
+                return dict()
+            if not self.changes or version < self.changes[0][0] - 1:
+                return None
+            return {code: self.items.get(code) for changed_version, code in self.changes if changed_version > version}
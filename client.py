@@ -0,0 +1,90 @@
+import urllib.request
+import urllib.error
+from datetime import date, datetime, time, timedelta
+
+import protocol
+
+base_url: str = "http://127.0.0.1:8765"
+
+
+def connect(url: str):
+    global base_url
+    base_url = url.rstrip("/")
+
+
+def call(function_name: str, kwargs: dict):
+    request = urllib.request.Request(
+        f"{base_url}/api/{function_name}",
+        data=protocol.dumps(kwargs),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return protocol.loads(response.read()).get("result")
+    except urllib.error.HTTPError as error:
+        raise RuntimeError(protocol.loads(error.read()).get("error")) from None
+
+
+def remote(function_name: str, *parameters: str):
+    def function(*args, **kwargs):
+        kwargs.update(zip(parameters, args))
+        return call(function_name, kwargs)
+    function.__name__ = function_name
+    return function
+
+
+# Same names and parameters as backend.py, ORM objects come back as SimpleNamespaces
+# carrying the same column attributes.
+get_item = remote("get_item", "code")
+get_items = remote("get_items", "code_list")
+search_items = remote("search_items", "text", "limit")
+get_item_changes = remote("get_item_changes", "version")
+get_batches = remote("get_batches", "item_code", "exp_date", "obj", "exact")
+allocate_batches = remote("allocate_batches", "item_code", "quantity", "held")
+get_bill = remote("get_bill", "id")
+get_bills = remote("get_bills", "start", "end", "after", "limit")
+get_service_bill = remote("get_service_bill", "id")
+get_service_bills = remote("get_service_bills", "start", "end", "after", "limit")
+get_item_sales = remote("get_item_sales", "start", "end", "item_code", "by_batch")
+get_daily_sales = remote("get_daily_sales", "start", "end", "bill_type", "by_payment_type")
+get_sales_summary = remote("get_sales_summary", "start", "end", "bill_type")
+get_expiry_summary = remote("get_expiry_summary")
+get_expiry_items = remote("get_expiry_items", "within_months")
+get_value_at_risk = remote("get_value_at_risk", "within_months")
+get_stock_valuation = remote("get_stock_valuation", "day")
+get_stock_value_by_item = remote("get_stock_value_by_item", "day")
+get_stock_value_by_expiry_month = remote("get_stock_value_by_expiry_month", "day")
+get_stock_movements = remote("get_stock_movements", "item_code", "start", "end")
+check_stock_ledger = remote("check_stock_ledger")
+get_reorder_suggestions = remote("get_reorder_suggestions", "lead_days", "cover_days")
+get_fast_movers = remote("get_fast_movers", "limit", "lead_days", "cover_days")
+get_sales_by_period = remote("get_sales_by_period", "start", "end", "period", "bill_type")
+get_sales_by_payment_type = remote("get_sales_by_payment_type", "start", "end", "bill_type")
+get_top_items = remote("get_top_items", "start", "end", "limit", "by")
+get_discount_report = remote("get_discount_report", "start", "end", "period", "bill_type")
+get_gross_margin = remote("get_gross_margin", "start", "end", "group")
+create_item = remote("create_item", "name", "price", "life_cycle")
+create_batch = remote("create_batch", "item_code", "batch_no", "quantity", "price", "mfg_date", "exp_date")
+create_bill = remote("create_bill", "customer_name", "bill_json", "total_amount", "discount", "net_amount", "payment_type", "bill_date")
+create_service_bill = remote("create_service_bill", "patient_name", "bill_json", "total_amount", "discount", "net_amount", "payment_type", "bill_date")
+create_item_and_batch = remote("create_item_and_batch", "name", "batch_no", "quantity", "price", "mfg_date", "exp_date")
+edit_item = remote("edit_item", "code", "name", "price", "life_cycle")
+edit_batch = remote("edit_batch", "item_code", "batch_no", "quantity", "price", "mfg_date", "exp_date")
+delete_item = remote("delete_item", "code")
+delete_batch = remote("delete_batch", "item_code", "batch_no")
+import_stock = remote("import_stock", "rows")
+rebuild_daily_sales = remote("rebuild_daily_sales")
+rebuild_item_daily_sales = remote("rebuild_item_daily_sales")
+rebuild_expiry_buckets = remote("rebuild_expiry_buckets")
+snapshot_stock = remote("snapshot_stock")
+return_stock = remote("return_stock", "item_code", "batch_no", "quantity", "bill_id")
+
+
+def day_range(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def release_session(failed: bool = False):
+    pass
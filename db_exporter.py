@@ -1,15 +1,137 @@
+import os
+import csv
+import json
+import argparse
+from datetime import date, datetime
+from sqlalchemy import select, inspect
+
 from models import session
-from models import Item, Batch
+from models import Item, Batch, Bill, BillLine, ServiceBill, DailySales
+from models import ItemDailySales, ItemVelocity, ExpiryBucket, StockSnapshot, StockMovement
+
+TABLES = {
+    "items": Item,
+    "batches": Batch,
+    "bills": Bill,
+    "service_bills": ServiceBill,
+    "bill_lines": BillLine,
+    "daily_sales": DailySales,
+    "stock_movements": StockMovement,
+    "stock_snapshots": StockSnapshot,
+    "item_daily_sales": ItemDailySales,
+    "item_velocity": ItemVelocity,
+    "expiry_buckets": ExpiryBucket,
+}
+
+
+def table_columns(model) -> list[tuple[str, object]]:
+    return [(attribute.key, attribute.columns[0]) for attribute in inspect(model).column_attrs]
+
+
+def iter_rows(model, chunk_size: int = 10000):
+    # yield_per hands rows over a chunk at a time instead of loading the whole table.
+    statement = select(*[column.label(key) for key, column in table_columns(model)]).order_by(*model.__table__.primary_key.columns)
+    result = session.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield partition
+
+
+class CsvWriter:
+    extension = "csv"
+
+    def __init__(self, path: str, columns: list[tuple[str, object]]):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([key for key, _ in columns])
+
+    def write(self, rows: list):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable.")
+
+
+class JsonLinesWriter:
+    extension = "jsonl"
+
+    def __init__(self, path: str, columns: list[tuple[str, object]]):
+        self.file = open(path, "w", encoding="utf-8")
+        self.keys = [key for key, _ in columns]
+
+    def write(self, rows: list):
+        self.file.writelines(json.dumps(dict(zip(self.keys, row)), default=json_value) + "\n" for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    # Every chunk becomes one row group, pyarrow is only needed for this format.
+    extension = "parquet"
+
+    def __init__(self, path: str, columns: list[tuple[str, object]]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet export needs pyarrow: pip install pyarrow") from None
+        arrow_types = {
+            int: pyarrow.int64(), float: pyarrow.float64(), str: pyarrow.string(),
+            date: pyarrow.date32(), datetime: pyarrow.timestamp("us"),
+        }
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(key, arrow_types[column.type.python_type]) for key, column in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows: list):
+        arrays = [self.pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonLinesWriter, "parquet": ParquetWriter}
+
+
+def export_table(name: str, output_format: str, directory: str = ".", chunk_size: int = 10000) -> tuple[str, int]:
+    model = TABLES[name]
+    writer_class = WRITERS[output_format]
+    path = os.path.join(directory, f"{name}.{writer_class.extension}")
+    writer = writer_class(path, table_columns(model))
+    count = 0
+    try:
+        for rows in iter_rows(model, chunk_size):
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        writer.close()
+        session.remove()
+    return path, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the pharmacy database table by table.")
+    parser.add_argument("tables", nargs="*", help=f"Tables to export, all of them by default: {', '.join(TABLES)}.")
+    parser.add_argument("--format", dest="output_format", choices=list(WRITERS), default="csv")
+    parser.add_argument("--output", default="export", help="Directory the files are written to.")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    for name in args.tables:
+        if name not in TABLES:
+            parser.error(f"unknown table {name!r}")
 
+    os.makedirs(args.output, exist_ok=True)
+    for name in args.tables or TABLES:
+        path, count = export_table(name, args.output_format, args.output, args.chunk_size)
+        print(f"{count} rows written to {path}")
 
-items = session.query(Item).order_by(Item.code).all()
-with open("items.txt", "w") as f:
-    for item in items:
-        string = f"{item.code}, {item.name}, {item.price}, {item.life_cycle}\n"
-        f.write(string)
 
-batches = session.query(Batch).order_by(Batch.item_code).all()
-with open("batches.txt", "w") as f:
-    for batch in batches:
-        string = f"{batch.item_code}, {batch.batch_no}, {batch.quantity}, {batch.price}, {batch.mfg_date}, {batch.exp_date}\n"
-        f.write(string)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from typing import Callable
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+from api import release_session
+from .side_windows import show_message
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
+
+
+class Task(QRunnable):
+    def __init__(self, task_id: int, function: Callable, signals: TaskSignals):
+        super(Task, self).__init__()
+        self.task_id = task_id
+        self.function = function
+        self.signals = signals
+
+    def run(self):
+        # models.session is thread-scoped, so every worker thread gets its own session
+        # and hands it back once the task is done.
+        try:
+            result = self.function()
+        except Exception as error:
+            release_session(failed=True)
+            self.signals.failed.emit(self.task_id, error)
+        else:
+            release_session()
+            self.signals.finished.emit(self.task_id, result)
+
+
+# Runs backend calls on a thread pool and delivers their results back on the GUI thread.
+# The function handed to submit must return plain data (dicts, ids), not ORM objects,
+# since those are tied to the worker's session. Tasks submitted under the same key
+# replace each other, only the result of the latest one is delivered.
+class BackendExecutor(QObject):
+    def __init__(self, parent=None, max_threads: int = 4):
+        super(BackendExecutor, self).__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.signals = TaskSignals(self)
+        self.signals.finished.connect(self.task_finished)
+        self.signals.failed.connect(self.task_failed)
+        self.next_id: int = 0
+        self.callbacks: dict[int, tuple[str | None, Callable, Callable | None]] = dict()
+        self.latest: dict[str, int] = dict()
+
+    def submit(self, function: Callable, on_result: Callable, on_error: Callable | None = None, key: str | None = None) -> int:
+        self.next_id += 1
+        self.callbacks[self.next_id] = (key, on_result, on_error)
+        if key is not None:
+            self.latest[key] = self.next_id
+        self.pool.start(Task(self.next_id, function, self.signals))
+        return self.next_id
+
+    def cancel(self, key: str):
+        # Results of tasks already running under key are dropped when they arrive.
+        self.latest.pop(key, None)
+
+    def is_current(self, task_id: int, key: str | None) -> bool:
+        return key is None or self.latest.get(key) == task_id
+
+    @pyqtSlot(int, object)
+    def task_finished(self, task_id: int, result):
+        key, on_result, _ = self.callbacks.pop(task_id)
+        if self.is_current(task_id, key):
+            on_result(result)
+
+    @pyqtSlot(int, object)
+    def task_failed(self, task_id: int, error):
+        key, _, on_error = self.callbacks.pop(task_id)
+        if not self.is_current(task_id, key):
+            return None
+        if on_error is not None:
+            on_error(error)
+        else:
+            show_message(title="Error", message=str(error))
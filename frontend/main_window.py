@@ -1,29 +1,99 @@
 import re
 from dotenv import dotenv_values
-from datetime import date
-from PyQt6.uic import loadUi
+from datetime import date, timedelta
+from .ui import setup_ui
 from PyQt6.QtCore import QDate, QDateTime, Qt
-from PyQt6.QtWidgets import QMainWindow, QTableWidgetItem, QComboBox, QSpinBox, QDoubleSpinBox, QDateEdit
-from PyQt6.QtWidgets import QAbstractSpinBox, QPushButton, QLineEdit
-from PyQt6.QtGui import QColor
-
-from backend import create_item, create_batch, create_item_and_batch, create_bill, create_service_bill
-from backend import get_item, get_items, get_batches, get_bills, get_service_bills
-from backend import edit_item, edit_batch, delete_item, delete_batch
+from PyQt6.QtCore import QModelIndex
+from PyQt6.QtWidgets import QMainWindow, QComboBox, QSpinBox, QDoubleSpinBox, QDateEdit
+from PyQt6.QtWidgets import QAbstractSpinBox, QLineEdit, QFileDialog
+
+from api import create_item, create_batch, create_item_and_batch, create_bill, create_service_bill
+from api import get_item, get_items, get_item_changes, search_items, get_batches, allocate_batches, get_bills, get_service_bills, day_range, get_sales_summary
+from api import get_expiry_summary, get_expiry_items, get_value_at_risk, get_stock_valuation
+from api import edit_item, edit_batch, delete_item, delete_batch, import_stock, get_reorder_suggestions, warm_up
+from stock_import import read_stock_file
+from replenishment import write_purchase_order
 from .side_windows import show_message, BillWindow, ServiceBillWindow
+from .table_models import DictTableModel
+from .executor import BackendExecutor
 
 # For Type Hinting
 from PyQt6 import QtWidgets, QtGui
 
+BILL_PAGE_SIZE = 100
+
+ITEM_COLUMNS = [
+    ("          Code          ", "code"),
+    ("          Name          ", "name"),
+    ("     Price     ", "price"),
+    ("Life Cycle(in Months)", "life_cycle"),
+]
+BATCH_COLUMNS = [
+    ("          Batch No.          ", "batch_no"),
+    ("          Name          ", "name"),
+    ("Quantity", "quantity"),
+    ("     Price     ", "price"),
+    ("    Total    ", "total"),
+    ("Mfg Date", "mfg_date"),
+    ("Exp Date", "exp_date"),
+]
+BILL_COLUMNS = [
+    ("Bill No.", "id"),
+    ("          Customer's Name          ", "customer_name"),
+    ("     Bill Date     ", "bill_date"),
+    ("Total Amount", "total_amount"),
+    ("   Discount   ", "discount"),
+    ("Net Amount", "net_amount"),
+]
+SERVICE_BILL_COLUMNS = [
+    ("Bill No.", "id"),
+    ("          Patient's Name          ", "patient_name"),
+    ("     Bill Date     ", "bill_date"),
+    ("Total Amount", "total_amount"),
+    ("   Discount   ", "discount"),
+    ("Net Amount", "net_amount"),
+]
+EXPIRY_SUMMARY_COLUMNS = [
+    ("     Expiry     ", "bucket"),
+    ("Batches", "batch_count"),
+    ("Quantity", "quantity"),
+    ("     Value     ", "value"),
+]
+EXPIRY_COLUMNS = [
+    ("          Code          ", "code"),
+    ("          Name          ", "name"),
+    ("Expired", "expired"),
+    ("< 1 Month", "1_month"),
+    ("< 3 Months", "3_months"),
+    ("< 6 Months", "6_months"),
+    ("  Value at Risk  ", "at_risk"),
+]
+EXPIRY_BUCKET_NAMES = {"expired": "Expired", "1_month": "< 1 Month", "3_months": "< 3 Months", "6_months": "< 6 Months", "later": "Later"}
+
+
+def sorted_position(combo: QComboBox, text: str) -> int:
+    # Index 0 is the blank entry, the rest are kept in code order.
+    low, high = 1, combo.count()
+    while low < high:
+        middle = (low + high) // 2
+        if combo.itemText(middle) < text:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super(MainWindow, self).__init__()
-        loadUi("UI/main.ui", self)
+        setup_ui(self, "main")
 
         self.current_lifecycle: int = 0
-        self.items_list: list[dict] = get_items()
+        self.items_versions: dict[str, int] = dict()
 
+        self.executor = BackendExecutor(self)
+        self.executor.submit(warm_up, lambda _: None)
+        self.load_table_models()
         self.load_top_layout()
         self.load_menubar_logic()
         self.load_page_logic()
@@ -39,6 +109,9 @@ class MainWindow(QMainWindow):
         self.action_add_item: QtGui.QAction
         self.action_add_batch: QtGui.QAction
         self.action_add_item_and_batch: QtGui.QAction
+        self.action_import_stock: QtGui.QAction
+        self.action_expiry_dashboard: QtGui.QAction
+        self.action_export_purchase_order: QtGui.QAction
         self.action_add_bill: QtGui.QAction
         self.action_add_service_bill: QtGui.QAction
         self.action_get_all_items: QtGui.QAction
@@ -48,6 +121,9 @@ class MainWindow(QMainWindow):
         self.action_edit_item: QtGui.QAction
         self.action_edit_batch: QtGui.QAction
 
+        # Status Bar
+        self.statusbar: QtWidgets.QStatusBar
+
         # Stacked Widget and Pages
         self.stacked_widget: QtWidgets.QStackedWidget
         self.page_add_item: QtWidgets.QWidget
@@ -59,23 +135,29 @@ class MainWindow(QMainWindow):
         self.page_get_all_bills: QtWidgets.QWidget
         self.page_edit_item: QtWidgets.QWidget
         self.page_edit_batch: QtWidgets.QWidget
+        self.page_expiry: QtWidgets.QWidget
 
         # Get All Items Page
-        self.table_item: QtWidgets.QTableWidget
+        self.table_item: QtWidgets.QTableView
+
+        # Expiry Dashboard Page
+        self.label_value_at_risk: QtWidgets.QLabel
+        self.table_expiry_summary: QtWidgets.QTableView
+        self.table_expiry: QtWidgets.QTableView
 
         # Get Batches Page
-        self.table_batch: QtWidgets.QTableWidget
+        self.table_batch: QtWidgets.QTableView
         self.input_batch_filter_code: QtWidgets.QComboBox
         self.input_batch_filter_date: QtWidgets.QDateEdit
         self.button_batch_filter_reset: QtWidgets.QPushButton
 
         # Get All Bills Page
-        self.table_bill: QtWidgets.QTableWidget
+        self.table_bill: QtWidgets.QTableView
         self.input_list_bills_date: QtWidgets.QDateEdit
         self.input_bill_day_total: QtWidgets.QDoubleSpinBox
 
         # Get All Service Bills Page
-        self.table_service_bill: QtWidgets.QTableWidget
+        self.table_service_bill: QtWidgets.QTableView
         self.input_list_service_bills_date: QtWidgets.QDateEdit
         self.input_service_bill_day_total: QtWidgets.QDoubleSpinBox
 
@@ -143,6 +225,20 @@ class MainWindow(QMainWindow):
         self.button_edit_batch: QtWidgets.QPushButton
         self.button_delete_batch: QtWidgets.QPushButton
 
+    def load_table_models(self):
+        self.item_model = DictTableModel(ITEM_COLUMNS, parent=self)
+        self.batch_model = DictTableModel(BATCH_COLUMNS, parent=self)
+        self.bill_model = DictTableModel(BILL_COLUMNS, page_size=BILL_PAGE_SIZE, executor=self.executor, parent=self)
+        self.service_bill_model = DictTableModel(SERVICE_BILL_COLUMNS, page_size=BILL_PAGE_SIZE, executor=self.executor, parent=self)
+        self.expiry_summary_model = DictTableModel(EXPIRY_SUMMARY_COLUMNS, parent=self)
+        self.expiry_model = DictTableModel(EXPIRY_COLUMNS, parent=self)
+        self.table_item.setModel(self.item_model)
+        self.table_batch.setModel(self.batch_model)
+        self.table_bill.setModel(self.bill_model)
+        self.table_service_bill.setModel(self.service_bill_model)
+        self.table_expiry_summary.setModel(self.expiry_summary_model)
+        self.table_expiry.setModel(self.expiry_model)
+
     def load_top_layout(self):
         env = dotenv_values(".env")
         self.pharmacy_name.setText(env.get("PHARMACY_NAME"))
@@ -167,6 +263,9 @@ class MainWindow(QMainWindow):
         self.action_get_all_service_bills.triggered.connect(lambda: change_screen("page_get_all_service_bills"))
         self.action_edit_item.triggered.connect(lambda: change_screen("page_edit_item"))
         self.action_edit_batch.triggered.connect(lambda: change_screen("page_edit_batch"))
+        self.action_import_stock.triggered.connect(self.import_stock_triggered)
+        self.action_expiry_dashboard.triggered.connect(lambda: change_screen("page_expiry"))
+        self.action_export_purchase_order.triggered.connect(self.export_purchase_order_triggered)
 
     def load_page_logic(self):
         # Get All Items Page
@@ -178,9 +277,11 @@ class MainWindow(QMainWindow):
 
         # Get All Bills Page
         self.input_list_bills_date.dateChanged.connect(self.list_bill_date_changed)
+        self.table_bill.doubleClicked.connect(self.bill_table_double_clicked)
 
         # Get All Service Bills Page
         self.input_list_service_bills_date.dateChanged.connect(self.list_service_bill_date_changed)
+        self.table_service_bill.doubleClicked.connect(self.service_bill_table_double_clicked)
 
         # Add Item Page
         self.button_add_item.clicked.connect(self.add_item_button_clicked)
@@ -219,92 +320,76 @@ class MainWindow(QMainWindow):
     def batch_reset_button_clicked(self):
         self.input_batch_filter_code.setCurrentIndex(0)
         self.input_batch_filter_date.setDate(QDate.currentDate())
-        self.table_batch.setRowCount(0)
-        for row in get_batches():
-            row_count = self.table_batch.rowCount()
-            self.table_batch.insertRow(row_count)
-            for i, column in enumerate(["batch_no", "name", "quantity", "price", "total", "mfg_date", "exp_date"]):
-                table_item = QTableWidgetItem(row.get(column))
-                if row.get("color") is not None:
-                    table_item.setBackground(QColor(*row.get("color")))
-                self.table_batch.setItem(row_count, i, table_item)
-        self.table_batch.resizeColumnsToContents()
+        self.load_batches()
 
     def batch_filter_code_changed(self):
         current_text = self.input_batch_filter_code.currentText()
         if not current_text:
             return None
         current_text = re.sub('[^A-Za-z0-9]+', '', current_text).lower()
-        self.table_batch.setRowCount(0)
-        for row in get_batches(item_code=current_text):
-            row_count = self.table_batch.rowCount()
-            self.table_batch.insertRow(row_count)
-            for i, column in enumerate(["batch_no", "name", "quantity", "price", "total", "mfg_date", "exp_date"]):
-                table_item = QTableWidgetItem(row.get(column))
-                if row.get("color") is not None:
-                    table_item.setBackground(QColor(*row.get("color")))
-                self.table_batch.setItem(row_count, i, table_item)
-        self.table_batch.resizeColumnsToContents()
+        self.load_batches(item_code=current_text)
 
     def batch_filter_date_changed(self):
-        self.table_batch.setRowCount(0)
-        for row in get_batches(exp_date=self.input_batch_filter_date.date().toPyDate()):
-            row_count = self.table_batch.rowCount()
-            self.table_batch.insertRow(row_count)
-            for i, column in enumerate(["batch_no", "name", "quantity", "price", "mfg_date", "exp_date"]):
-                table_item = QTableWidgetItem(row.get(column))
-                if row.get("color") is not None:
-                    table_item.setBackground(QColor(*row.get("color")))
-                self.table_batch.setItem(row_count, i, table_item)
+        self.load_batches(exp_date=self.input_batch_filter_date.date().toPyDate())
+
+    def load_batches(self, **filters):
+        self.set_loading(self.table_batch, True)
+        self.executor.submit(lambda: get_batches(**filters), self.batches_loaded, self.loading_failed(self.table_batch), key="batches")
+
+    def batches_loaded(self, rows: list[dict]):
+        self.batch_model.set_rows(rows)
         self.table_batch.resizeColumnsToContents()
+        self.set_loading(self.table_batch, False)
+
+    def expiry_loaded(self, result: tuple[list[dict], list[dict], dict, dict]):
+        summary, items, at_risk, valuation = result
+        for row in summary:
+            row["bucket"] = EXPIRY_BUCKET_NAMES.get(row.get("bucket"))
+        self.expiry_summary_model.set_rows(summary)
+        self.expiry_model.set_rows(items)
+        self.label_value_at_risk.setText(
+            f"Stock value: {valuation.get('value'):.2f}    Expired: {at_risk.get('expired'):.2f}    "
+            f"Expiring within 6 months: {at_risk.get('expiring'):.2f}"
+        )
+        self.table_expiry_summary.resizeColumnsToContents()
+        self.table_expiry.resizeColumnsToContents()
+        self.set_loading(self.table_expiry, False)
 
     def list_bill_date_changed(self):
-        self.table_bill.setRowCount(0)
-        day_total: float = 0
-
-        def fill_table_row(row):
-            row_count = self.table_bill.rowCount()
-            self.table_bill.insertRow(row_count)
-            self.table_bill.setItem(row_count, 0, QTableWidgetItem(row.get("id")))
-            self.table_bill.setItem(row_count, 1, QTableWidgetItem(row.get("customer_name")))
-            self.table_bill.setItem(row_count, 2, QTableWidgetItem(row.get("bill_date")))
-            self.table_bill.setItem(row_count, 3, QTableWidgetItem(row.get("total_amount")))
-            self.table_bill.setItem(row_count, 4, QTableWidgetItem(row.get("discount")))
-            self.table_bill.setItem(row_count, 5, QTableWidgetItem(row.get("net_amount")))
-            bill_detail_button = QPushButton()
-            bill_detail_button.setText("Bill Detail")
-            bill_detail_button.clicked.connect(lambda: self.show_bill_window(row.get("id")))
-            self.table_bill.setCellWidget(row_count, 6, bill_detail_button)
-            return float(row.get("net_amount"))
-
-        for row in get_bills(date=self.input_list_bills_date.date().toPyDate()):
-            day_total += fill_table_row(row)
+        day = self.input_list_bills_date.date().toPyDate()
+        self.set_loading(self.table_bill, True)
+        self.executor.submit(
+            lambda: (get_bills(*day_range(day)), get_sales_summary(day, day + timedelta(days=1))),
+            self.bills_for_day_loaded, self.loading_failed(self.table_bill), key="bills"
+        )
+
+    def bills_for_day_loaded(self, result: tuple[list[dict], dict]):
+        rows, summary = result
+        self.bill_model.set_rows(rows)
         self.table_bill.resizeColumnsToContents()
-        self.input_bill_day_total.setValue(day_total)
+        self.input_bill_day_total.setValue(summary.get("net"))
+        self.set_loading(self.table_bill, False)
 
     def list_service_bill_date_changed(self):
-        self.table_service_bill.setRowCount(0)
-        day_total: float = 0
-
-        def fill_table_row(row):
-            row_count = self.table_service_bill.rowCount()
-            self.table_service_bill.insertRow(row_count)
-            self.table_service_bill.setItem(row_count, 0, QTableWidgetItem(row.get("id")))
-            self.table_service_bill.setItem(row_count, 1, QTableWidgetItem(row.get("patient_name")))
-            self.table_service_bill.setItem(row_count, 2, QTableWidgetItem(row.get("bill_date")))
-            self.table_service_bill.setItem(row_count, 3, QTableWidgetItem(row.get("total_amount")))
-            self.table_service_bill.setItem(row_count, 4, QTableWidgetItem(row.get("discount")))
-            self.table_service_bill.setItem(row_count, 5, QTableWidgetItem(row.get("net_amount")))
-            bill_detail_button = QPushButton()
-            bill_detail_button.setText("Bill Detail")
-            bill_detail_button.clicked.connect(lambda: self.show_service_bill_window(row.get("id")))
-            self.table_service_bill.setCellWidget(row_count, 6, bill_detail_button)
-            return float(row.get("total_amount"))
-
-        for row in get_service_bills(date=self.input_list_service_bills_date.date().toPyDate()):
-            day_total += fill_table_row(row)
+        day = self.input_list_service_bills_date.date().toPyDate()
+        self.set_loading(self.table_service_bill, True)
+        self.executor.submit(
+            lambda: (get_service_bills(*day_range(day)), get_sales_summary(day, day + timedelta(days=1), bill_type="service_bill")),
+            self.service_bills_for_day_loaded, self.loading_failed(self.table_service_bill), key="service_bills"
+        )
+
+    def service_bills_for_day_loaded(self, result: tuple[list[dict], dict]):
+        rows, summary = result
+        self.service_bill_model.set_rows(rows)
         self.table_service_bill.resizeColumnsToContents()
-        self.input_service_bill_day_total.setValue(day_total)
+        self.input_service_bill_day_total.setValue(summary.get("gross"))
+        self.set_loading(self.table_service_bill, False)
+
+    def bill_table_double_clicked(self, index: QModelIndex):
+        self.show_bill_window(self.bill_model.row(index.row()).get("id"))
+
+    def service_bill_table_double_clicked(self, index: QModelIndex):
+        self.show_service_bill_window(self.service_bill_model.row(index.row()).get("id"))
 
     def add_item_button_clicked(self):
         name = self.input_item_name.text()
@@ -313,11 +398,14 @@ class MainWindow(QMainWindow):
         if not (name and price):
             show_message(title="Missing Value", message="One or more field is missing a value.")
             return None
-        response = create_item(name, price, lifecycle)
+        self.set_loading(self.button_add_item, True)
+        self.executor.submit(lambda: create_item(name, price, lifecycle), self.item_created, self.loading_failed(self.button_add_item))
+
+    def item_created(self, response: dict | str):
+        self.set_loading(self.button_add_item, False)
         if type(response) is str:
             show_message(title="Error", message=response)
             return None
-        self.items_list = get_items()
         self.reset_page_add_item()
         show_message(title="Success", message=f"{response.get('code')} successfully created.")
 
@@ -333,8 +421,6 @@ class MainWindow(QMainWindow):
 
     def add_batch_button_clicked(self):
         code = self.input_item_code.currentText()
-        if get_item(code=code) is None:
-            return None
         batch_no = self.input_batch_no.text()
         quantity = self.input_quantity.value()
         price = self.input_batch_price.value()
@@ -343,12 +429,23 @@ class MainWindow(QMainWindow):
             return None
         mfg_date = self.input_mfg_date.date().toPyDate()
         exp_date = self.input_exp_date.date().toPyDate()
-        response = create_batch(code, batch_no, quantity, price, mfg_date, exp_date)
+        self.set_loading(self.button_add_batch, True)
+
+        def save_batch():
+            if get_item(code=code) is None:
+                return f"Item {code} doesn't exist."
+            batch = create_batch(code, batch_no, quantity, price, mfg_date, exp_date)
+            return batch if type(batch) is str else {"batch_no": batch.batch_no}
+
+        self.executor.submit(save_batch, self.batch_created, self.loading_failed(self.button_add_batch))
+
+    def batch_created(self, response: dict | str):
+        self.set_loading(self.button_add_batch, False)
         if type(response) is str:
             show_message(title="Error", message=response)
             return None
         self.reset_page_add_batch()
-        show_message(title="Success", message=f"{response.batch_no} successfully created.")
+        show_message(title="Success", message=f"{response.get('batch_no')} successfully created.")
 
     def add_both_button_clicked(self):
         name = self.input_both_item_name.text()
@@ -360,10 +457,56 @@ class MainWindow(QMainWindow):
             return None
         mfg_date = self.input_both_mfg_date.date().toPyDate()
         exp_date = self.input_both_exp_date.date().toPyDate()
-        item, batch = create_item_and_batch(name, batch_no, quantity, price, mfg_date, exp_date)
-        self.items_list = get_items()
+        self.set_loading(self.button_add_both, True)
+
+        def save_item_and_batch():
+            item, batch = create_item_and_batch(name, batch_no, quantity, price, mfg_date, exp_date)
+            return item.name, batch.batch_no
+
+        self.executor.submit(save_item_and_batch, self.item_and_batch_created, self.loading_failed(self.button_add_both))
+
+    def item_and_batch_created(self, result: tuple[str, str]):
+        name, batch_no = result
+        self.set_loading(self.button_add_both, False)
         self.reset_page_add_item_and_batch()
-        show_message(title="Success", message=f"{item.name} Batch No.: {batch.batch_no} successfully created.")
+        show_message(title="Success", message=f"{name} Batch No.: {batch_no} successfully created.")
+
+    def import_stock_triggered(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Stock", "", "Stock files (*.csv *.xlsx)")
+        if not path:
+            return None
+        self.statusbar.showMessage(f"Importing {path}...")
+        self.executor.submit(lambda: import_stock(read_stock_file(path)), self.stock_imported, self.background_task_failed)
+
+    def stock_imported(self, result: dict):
+        self.statusbar.clearMessage()
+        errors = result.get("errors")
+        if errors:
+            lines = [f"Row {error.get('row')}: {error.get('message')}" for error in errors[:20]]
+            if len(errors) > 20:
+                lines.append(f"...and {len(errors) - 20} more.")
+            show_message(title="Nothing Imported", message="\n".join(lines))
+            return None
+        self.sync_item_combos()
+        show_message(title="Success", message=f"{result.get('batches')} batches imported, {result.get('items')} of them for new items.")
+
+    def background_task_failed(self, error: Exception):
+        self.statusbar.clearMessage()
+        show_message(title="Error", message=str(error))
+
+    def export_purchase_order_triggered(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Purchase Order", f"purchase_order_{date.today()}.csv", "CSV files (*.csv)")
+        if not path:
+            return None
+        self.statusbar.showMessage(f"Writing {path}...")
+        self.executor.submit(lambda: write_purchase_order(path, get_reorder_suggestions()), self.purchase_order_exported, self.background_task_failed)
+
+    def purchase_order_exported(self, count: int):
+        self.statusbar.clearMessage()
+        if not count:
+            show_message(title="Nothing to Reorder", message="Every item has enough stock for its recent sales.")
+            return None
+        show_message(title="Success", message=f"{count} items to reorder written to the purchase order.")
 
     def add_next_item_button_clicked(self):
         cell_particular = QComboBox()
@@ -405,6 +548,7 @@ class MainWindow(QMainWindow):
         cell_particular.activated.connect(lambda: self.cell_particular_activated(row_count))
         cell_batch_no.activated.connect(lambda: self.cell_batch_no_activated(row_count))
         cell_quantity.valueChanged.connect(lambda: self.cell_quantity_updated(row_count))
+        cell_quantity.editingFinished.connect(lambda: self.allocate_bill_row(row_count))
 
         for i, cell in enumerate([cell_particular, cell_batch_no, cell_mfg_date, cell_exp_date, cell_quantity, cell_price, cell_single_total]):
             self.table_add_bill.setCellWidget(row_count, i, cell)
@@ -416,23 +560,61 @@ class MainWindow(QMainWindow):
         if not current_text:
             return None
         current_text = re.sub('[^A-Za-z0-9 ]+', '', current_text).lower()
-        item = get_item(code=current_text.replace(" ", ""))
+
+        def find_items():
+            item = get_item(code=current_text.replace(" ", ""))
+            if item is not None:
+                return [(item.name, item.code)]
+            return [(item.get("name"), item.get("code")) for item in search_items(current_text)]
+
+        self.executor.submit(find_items, lambda items: self.bill_row_items_found(row_no, items), key=f"bill_row_{row_no}")
+
+    def bill_row_items_found(self, row_no, items: list[tuple[str, str]]):
         self.table_add_bill.cellWidget(row_no, 0).clear()
-        if item is not None:
-            self.table_add_bill.cellWidget(row_no, 0).addItem(item.name, item.code)
-        else:
-            current_text = current_text.split()
-            for item in get_items(code_list=current_text):
-                self.table_add_bill.cellWidget(row_no, 0).addItem(item.get("name"), item.get("code"))
+        for name, code in items:
+            self.table_add_bill.cellWidget(row_no, 0).addItem(name, code)
+        self.allocate_bill_row(row_no)
 
+    def allocate_bill_row(self, row_no):
         code = self.table_add_bill.cellWidget(row_no, 0).currentData()
         if not code:
             return None
+        requested = max(self.table_add_bill.cellWidget(row_no, 4).value(), 1)
+        held: dict[str, int] = dict()
+        for other_row in range(self.table_add_bill.rowCount()):
+            if other_row != row_no and self.table_add_bill.cellWidget(other_row, 0).currentData() == code:
+                batch_no = self.table_add_bill.cellWidget(other_row, 1).currentText()
+                held[batch_no] = held.get(batch_no, 0) + self.table_add_bill.cellWidget(other_row, 4).value()
+
+        self.executor.submit(
+            lambda: allocate_batches(code, requested, held),
+            lambda lines: self.bill_row_allocated(row_no, code, requested, lines), key=f"bill_row_{row_no}"
+        )
+
+    def bill_row_allocated(self, row_no, code: str, requested: int, lines: list[dict]):
+        if self.table_add_bill.cellWidget(row_no, 0).currentData() != code:
+            return None
+        name = self.table_add_bill.cellWidget(row_no, 0).currentText()
+        if not lines:
+            self.table_add_bill.cellWidget(row_no, 1).clear()
+            show_message(title="Out of Stock", message=f"{name} has no unexpired stock left.")
+            return None
+        self.fill_bill_row(row_no, lines[0])
+        for line in lines[1:]:
+            self.add_next_item_button_clicked()
+            new_row = self.table_add_bill.rowCount() - 1
+            self.table_add_bill.cellWidget(new_row, 0).addItem(name, code)
+            self.fill_bill_row(new_row, line)
+
+        allocated = sum(line.get("quantity") for line in lines)
+        if allocated < requested:
+            show_message(title="Not enough stock", message=f"Only {allocated} of {requested} {name} in stock.")
+
+    def fill_bill_row(self, row_no, line: dict):
         self.table_add_bill.cellWidget(row_no, 1).clear()
-        for batch in get_batches(item_code=code, obj=True, exact=True):
-            if batch.exp_date > date.today().replace(day=1):
-                self.table_add_bill.cellWidget(row_no, 1).addItem(batch.batch_no, (batch.mfg_date, batch.exp_date, batch.price))
+        self.table_add_bill.cellWidget(row_no, 1).addItem(line.get("batch_no"), (line.get("mfg_date"), line.get("exp_date"), line.get("price")))
         self.cell_batch_no_activated(row_no)
+        self.table_add_bill.cellWidget(row_no, 4).setValue(line.get("quantity"))
 
     def cell_batch_no_activated(self, row_no):
         data = self.table_add_bill.cellWidget(row_no, 1).currentData()
@@ -476,9 +658,22 @@ class MainWindow(QMainWindow):
                 "total": self.table_add_bill.cellWidget(row, 6).value()
             }
             bill_json.append(row_json)
-        bill = create_bill(customer_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date)
+        self.set_loading(self.button_add_bill, True)
+
+        def save_bill():
+            bill = create_bill(customer_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date)
+            return bill if isinstance(bill, list) else bill.id
+
+        self.executor.submit(save_bill, self.bill_created, self.loading_failed(self.button_add_bill))
+
+    def bill_created(self, result: int | list[dict]):
+        self.set_loading(self.button_add_bill, False)
+        if isinstance(result, list):
+            lines = [f"{shortfall.get('item_code')} ({shortfall.get('batch_no')}): {shortfall.get('requested')} requested, {shortfall.get('available')} in stock" for shortfall in result]
+            show_message(title="Not enough stock", message="\n".join(lines))
+            return None
         self.reset_page_add_bill()
-        self.show_bill_window(bill.id)
+        self.show_bill_window(result)
 
     def add_next_service_item_button_clicked(self):
         cell_particular = QLineEdit()
@@ -534,19 +729,35 @@ class MainWindow(QMainWindow):
                 "total": self.table_add_service_bill.cellWidget(row, 3).value(),
             }
             bill_json.append(row_json)
-        service_bill = create_service_bill(patient_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date)
+        self.set_loading(self.button_add_service_bill, True)
+        self.executor.submit(
+            lambda: create_service_bill(patient_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date).id,
+            self.service_bill_created, self.loading_failed(self.button_add_service_bill)
+        )
+
+    def service_bill_created(self, service_bill_id: int):
+        self.set_loading(self.button_add_service_bill, False)
         self.reset_page_add_service_bill()
-        self.show_service_bill_window(service_bill.id)
+        self.show_service_bill_window(service_bill_id)
 
     def edit_item_code_entered(self):
-        if not self.input_edit_code.currentText():
+        code = self.input_edit_code.currentText()
+        if not code:
             return None
-        response = get_item(code=self.input_edit_code.currentText())
-        if not response:
+
+        def load_item():
+            item = get_item(code=code)
+            return None if item is None else (item.name, item.price, item.life_cycle)
+
+        self.executor.submit(load_item, self.edit_item_loaded, key="edit_item")
+
+    def edit_item_loaded(self, item: tuple[str, float, int] | None):
+        if item is None:
             return None
-        self.input_edit_item_name.setText(response.name)
-        self.input_edit_price.setValue(float(response.price))
-        self.input_edit_lifecycle.setValue(int(response.life_cycle))
+        name, price, life_cycle = item
+        self.input_edit_item_name.setText(name)
+        self.input_edit_price.setValue(float(price))
+        self.input_edit_lifecycle.setValue(int(life_cycle))
 
     def edit_item_saved(self):
         code = self.input_edit_code.currentData()
@@ -556,33 +767,51 @@ class MainWindow(QMainWindow):
         name = self.input_edit_item_name.text()
         price = self.input_edit_price.value()
         lifecycle = self.input_edit_lifecycle.value()
-        response = edit_item(code, name, price, lifecycle)
+        self.set_loading(self.button_edit_item, True)
+
+        def save_item():
+            item = edit_item(code, name, price, lifecycle)
+            return item if type(item) is str else {"code": item.code}
+
+        self.executor.submit(save_item, self.item_edited, self.loading_failed(self.button_edit_item))
+
+    def item_edited(self, response: dict | str):
+        self.set_loading(self.button_edit_item, False)
         if type(response) is str:
             show_message(title="Error", message=response)
             return None
-        self.items_list = get_items()
         self.reset_page_edit_item()
-        show_message(title="Success", message=f"{response.code} sucessfully updated.")
+        show_message(title="Success", message=f"{response.get('code')} sucessfully updated.")
 
     def edit_item_deleted(self):
         code = self.input_edit_code.currentData()
         if not code:
             show_message(title="Missing Value", message="'Code' field is missing value.")
             return None
-        response = delete_item(code)
+        self.set_loading(self.button_delete_item, True)
+        self.executor.submit(lambda: delete_item(code), self.item_deleted, self.loading_failed(self.button_delete_item))
+
+    def item_deleted(self, response: str | None):
+        self.set_loading(self.button_delete_item, False)
         if type(response) is str:
             show_message(title="Error", message=response)
             return None
-        self.items_list = get_items()
         self.reset_page_edit_item()
         show_message(title="Success", message="Item sucessfully deleted.")
 
     def edit_batch_code_entered(self):
-        if not self.input_edit_item_code.currentData():
+        code = self.input_edit_item_code.currentData()
+        if not code:
             return None
+        self.executor.submit(
+            lambda: [(batch.batch_no, (batch.quantity, batch.price, batch.mfg_date, batch.exp_date)) for batch in get_batches(item_code=code, obj=True)],
+            self.edit_batches_loaded, key="edit_batches"
+        )
+
+    def edit_batches_loaded(self, batches: list[tuple[str, tuple]]):
         self.input_edit_batch_no.clear()
-        for batch in get_batches(item_code=self.input_edit_item_code.currentData(), obj=True):
-            self.input_edit_batch_no.addItem(batch.batch_no, (batch.quantity, batch.price, batch.mfg_date, batch.exp_date))
+        for batch_no, data in batches:
+            self.input_edit_batch_no.addItem(batch_no, data)
         if self.input_edit_batch_no.count() > 0:
             self.edit_batch_no_entered()
 
@@ -602,12 +831,21 @@ class MainWindow(QMainWindow):
         price = self.input_edit_batch_price.value()
         mfg_date = self.input_edit_mfg_date.date().toPyDate()
         exp_date = self.input_edit_exp_date.date().toPyDate()
-        response = edit_batch(code, batch_no, quantity, price, mfg_date, exp_date)
+        self.set_loading(self.button_edit_batch, True)
+
+        def save_batch():
+            batch = edit_batch(code, batch_no, quantity, price, mfg_date, exp_date)
+            return batch if type(batch) is str else {"batch_no": batch.batch_no}
+
+        self.executor.submit(save_batch, self.batch_edited, self.loading_failed(self.button_edit_batch))
+
+    def batch_edited(self, response: dict | str):
+        self.set_loading(self.button_edit_batch, False)
         if type(response) is str:
             show_message(title="Error", message=response)
             return None
         self.reset_page_edit_batch()
-        show_message(title="Success", message=f"{response.batch_no} successfully edited.")
+        show_message(title="Success", message=f"{response.get('batch_no')} successfully edited.")
 
     def edit_batch_deleted(self):
         code = self.input_edit_item_code.currentData()
@@ -615,13 +853,30 @@ class MainWindow(QMainWindow):
             show_message(title="Missing Value", message="One or more field is missing a value.")
             return None
         batch_no = self.input_edit_batch_no.currentText()
-        response = delete_batch(code, batch_no)
+        self.set_loading(self.button_delete_batch, True)
+        self.executor.submit(lambda: delete_batch(code, batch_no), self.batch_deleted, self.loading_failed(self.button_delete_batch))
+
+    def batch_deleted(self, response: str | None):
+        self.set_loading(self.button_delete_batch, False)
         if type(response) is str:
             show_message(title="Error", message=response)
             return None
         self.reset_page_edit_batch()
         show_message(title="Success", message="Batch successfully deleted.")
 
+    def set_loading(self, widget: QtWidgets.QWidget, loading: bool):
+        widget.setEnabled(not loading)
+        if loading:
+            self.statusbar.showMessage("Loading...")
+        else:
+            self.statusbar.clearMessage()
+
+    def loading_failed(self, widget: QtWidgets.QWidget):
+        def show_error(error: Exception):
+            self.set_loading(widget, False)
+            show_message(title="Error", message=str(error))
+        return show_error
+
     def show_bill_window(self, bill_id: int):
         self.bill_window = BillWindow(bill_id)
         self.bill_window.show()
@@ -632,24 +887,78 @@ class MainWindow(QMainWindow):
 
     # ------------------------------------------Reset Page Logic------------------------------------------
     # ----------------------------------------------------------------------------------------------------
+    def sync_item_combos(self):
+        # Only the combos on the page being shown are filled, the rest catch up through
+        # get_item_changes when their page is opened, so startup doesn't load every item.
+        page = self.stacked_widget.currentWidget()
+        versions = {
+            combo.objectName(): self.items_versions.get(combo.objectName(), 0)
+            for combo in (self.input_item_code, self.input_edit_code, self.input_edit_item_code) if page.isAncestorOf(combo)
+        }
+        if not versions:
+            return None
+
+        def load_changes():
+            changes = dict()
+            for name, version in versions.items():
+                version, changed = get_item_changes(version)
+                changes[name] = (version, changed, get_items() if changed is None else None)
+            return changes
+
+        self.executor.submit(load_changes, self.item_changes_loaded, key="item_combos")
+
+    def item_changes_loaded(self, combos: dict[str, tuple[int, dict | None, list[dict] | None]]):
+        item_data = {
+            "input_item_code": lambda item: (item.get("life_cycle"), item.get("price")),
+            "input_edit_code": lambda item: item.get("code"),
+            "input_edit_item_code": lambda item: item.get("code"),
+        }
+        for name, (version, changes, items) in combos.items():
+            combo: QComboBox = getattr(self, name)
+            if items is not None:
+                combo.clear()
+                combo.addItem(None, None)
+                for item in items:
+                    combo.addItem(item.get("code"), item_data[name](item))
+                self.items_versions[name] = version
+                continue
+            # Typing into the editable combos inserts entries without data, drop those.
+            for index in reversed(range(1, combo.count())):
+                if combo.itemData(index) is None:
+                    combo.removeItem(index)
+            for code, item in changes.items():
+                index = combo.findText(code)
+                if item is None:
+                    if index > 0:
+                        combo.removeItem(index)
+                elif index > 0:
+                    combo.setItemData(index, item_data[name](item))
+                else:
+                    combo.insertItem(sorted_position(combo, code), code, item_data[name](item))
+            self.items_versions[name] = version
+
     def reset_input_code_and_bill_table(self):
         self.current_lifecycle = 0
-        self.input_item_code.clear()
-        self.input_edit_code.clear()
-        self.input_edit_item_code.clear()
+        # Lookups still running for rows of the old bill mustn't fill the new one.
+        for row_no in range(self.table_add_bill.rowCount()):
+            self.executor.cancel(f"bill_row_{row_no}")
+        self.sync_item_combos()
+        self.input_item_code.setCurrentIndex(0)
+        self.input_edit_code.setCurrentIndex(0)
+        self.input_edit_item_code.setCurrentIndex(0)
         self.input_batch_filter_code.clear()
         self.table_add_bill.setRowCount(0)
         self.table_add_service_bill.setRowCount(0)
 
     def reset_page_get_all_items(self):
         self.reset_input_code_and_bill_table()
-        self.table_item.setRowCount(0)
-        for row in self.items_list:
-            row_count = self.table_item.rowCount()
-            self.table_item.insertRow(row_count)
-            for i, column in enumerate(row.values()):
-                self.table_item.setItem(row_count, i, QTableWidgetItem(column))
+        self.set_loading(self.table_item, True)
+        self.executor.submit(get_items, self.items_loaded, self.loading_failed(self.table_item), key="items")
+
+    def items_loaded(self, rows: list[dict]):
+        self.item_model.set_rows(rows)
         self.table_item.resizeColumnsToContents()
+        self.set_loading(self.table_item, False)
 
     def reset_page_get_batches(self):
         self.reset_input_code_and_bill_table()
@@ -659,50 +968,25 @@ class MainWindow(QMainWindow):
 
     def reset_page_get_all_bills(self):
         self.reset_input_code_and_bill_table()
+        # The page lists every bill until a day is picked, setting the date mustn't load that day.
+        self.input_list_bills_date.blockSignals(True)
         self.input_list_bills_date.setDate(QDate.currentDate())
+        self.input_list_bills_date.blockSignals(False)
+        self.executor.cancel("bills")
+        self.set_loading(self.table_bill, False)
         self.input_bill_day_total.setValue(0)
-        self.table_bill.setRowCount(0)
-
-        def fill_table_row(row):
-            row_count = self.table_bill.rowCount()
-            self.table_bill.insertRow(row_count)
-            self.table_bill.setItem(row_count, 0, QTableWidgetItem(row.get("id")))
-            self.table_bill.setItem(row_count, 1, QTableWidgetItem(row.get("customer_name")))
-            self.table_bill.setItem(row_count, 2, QTableWidgetItem(row.get("bill_date")))
-            self.table_bill.setItem(row_count, 3, QTableWidgetItem(row.get("total_amount")))
-            self.table_bill.setItem(row_count, 4, QTableWidgetItem(row.get("discount")))
-            self.table_bill.setItem(row_count, 5, QTableWidgetItem(row.get("net_amount")))
-            bill_detail_button = QPushButton()
-            bill_detail_button.setText("Bill Detail")
-            bill_detail_button.clicked.connect(lambda: self.show_bill_window(row.get("id")))
-            self.table_bill.setCellWidget(row_count, 6, bill_detail_button)
-
-        for row in get_bills():
-            fill_table_row(row)
+        self.bill_model.set_pager(lambda after, limit: get_bills(after=after, limit=limit))
         self.table_bill.resizeColumnsToContents()
 
     def reset_page_get_all_service_bills(self):
         self.reset_input_code_and_bill_table()
+        self.input_list_service_bills_date.blockSignals(True)
         self.input_list_service_bills_date.setDate(QDate.currentDate())
+        self.input_list_service_bills_date.blockSignals(False)
+        self.executor.cancel("service_bills")
+        self.set_loading(self.table_service_bill, False)
         self.input_service_bill_day_total.setValue(0)
-        self.table_service_bill.setRowCount(0)
-
-        def fill_table_row(row):
-            row_count = self.table_service_bill.rowCount()
-            self.table_service_bill.insertRow(row_count)
-            self.table_service_bill.setItem(row_count, 0, QTableWidgetItem(row.get("id")))
-            self.table_service_bill.setItem(row_count, 1, QTableWidgetItem(row.get("patient_name")))
-            self.table_service_bill.setItem(row_count, 2, QTableWidgetItem(row.get("bill_date")))
-            self.table_service_bill.setItem(row_count, 3, QTableWidgetItem(row.get("total_amount")))
-            self.table_service_bill.setItem(row_count, 4, QTableWidgetItem(row.get("discount")))
-            self.table_service_bill.setItem(row_count, 5, QTableWidgetItem(row.get("net_amount")))
-            bill_detail_button = QPushButton()
-            bill_detail_button.setText("Bill Detail")
-            bill_detail_button.clicked.connect(lambda: self.show_service_bill_window(row.get("id")))
-            self.table_service_bill.setCellWidget(row_count, 6, bill_detail_button)
-
-        for row in get_service_bills():
-            fill_table_row(row)
+        self.service_bill_model.set_pager(lambda after, limit: get_service_bills(after=after, limit=limit))
         self.table_service_bill.resizeColumnsToContents()
 
     def reset_page_add_item(self):
@@ -713,9 +997,6 @@ class MainWindow(QMainWindow):
 
     def reset_page_add_batch(self):
         self.reset_input_code_and_bill_table()
-        self.input_item_code.addItem(None, None)
-        for item in self.items_list:
-            self.input_item_code.addItem(item.get("code"), (item.get("life_cycle"), item.get("price")))
         self.input_batch_no.setText("")
         self.input_quantity.setValue(0)
         self.input_batch_price.setValue(0)
@@ -752,18 +1033,20 @@ class MainWindow(QMainWindow):
 
     def reset_page_edit_item(self):
         self.reset_input_code_and_bill_table()
-        self.input_edit_code.addItem(None, None)
-        for item in self.items_list:
-            self.input_edit_code.addItem(item.get("code"), item.get("code"))
         self.input_edit_item_name.setText("")
         self.input_edit_price.setValue(0)
         self.input_edit_lifecycle.setValue(0)
 
+    def reset_page_expiry(self):
+        self.reset_input_code_and_bill_table()
+        self.set_loading(self.table_expiry, True)
+        self.executor.submit(
+            lambda: (get_expiry_summary(), get_expiry_items(), get_value_at_risk(), get_stock_valuation()),
+            self.expiry_loaded, self.loading_failed(self.table_expiry), key="expiry"
+        )
+
     def reset_page_edit_batch(self):
         self.reset_input_code_and_bill_table()
-        self.input_edit_item_code.addItem(None, None)
-        for item in self.items_list:
-            self.input_edit_item_code.addItem(item.get("code"), item.get("code"))
         self.input_edit_batch_no.clear()
         self.input_edit_quantity.setValue(0)
         self.input_edit_batch_price.setValue(0)
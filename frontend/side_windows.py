@@ -1,11 +1,11 @@
-import os
 import json
+import subprocess
 from dotenv import dotenv_values
-from PyQt6.uic import loadUi
+from .ui import setup_ui
 from PyQt6.QtWidgets import QWidget, QMessageBox, QTableWidgetItem
-from docx import Document
 
-from backend import get_bill, get_service_bill
+from api import get_bill, get_service_bill, release_session
+from printing import print_bill
 
 # For Type Hinting
 from PyQt6 import QtWidgets
@@ -22,7 +22,7 @@ class BillWindow(QWidget):
     def __init__(self, bill_id: int):
         super(BillWindow, self).__init__()
         self.bill_id = bill_id
-        loadUi("UI/bill.ui", self)
+        setup_ui(self, "bill")
         self.load_pharma_info()
         self.load_bill()
 
@@ -52,6 +52,9 @@ class BillWindow(QWidget):
 
     def load_bill(self):
         bill = get_bill(id=self.bill_id)
+        # Released straight away, a session left open on the GUI thread keeps reading the
+        # snapshot it started with and wouldn't see bills saved later.
+        release_session()
         if bill is None:
             self.customer_name.setText("Name: Bill doesn't exist.")
             return None
@@ -78,84 +81,17 @@ class BillWindow(QWidget):
         self.button_print.clicked.connect(lambda: self.print_to_printer(bill))
 
     def print_to_printer(self, bill):
-        document = Document("bill_sample.docx")
-
-        id_string = f"[{bill.id:04d}]"
-        date_string = bill.bill_date.strftime("%d/%m/%Y")
-        customer_name = bill.customer_name
-        items = ""
-        total = f"{bill.total_amount:8.2f}"
-        discount = f"{bill.discount:8.2f}"
-        net_total = f"{bill.net_amount:8.2f}"
-        payment_type = f"[{bill.payment_type}]".rjust(11)
-
-        for i, item in enumerate(json.loads(bill.bill_json)):
-            sn = f"{i:02d}  "
-
-            particular = item.get("item_name", "")
-            particular_length = len(particular)
-            if particular_length < 10:
-                particular = f"{particular}\t\t"
-            elif particular_length < 16:
-                particular = f"{particular}\t"
-            else:
-                particular = particular[:15] + "\t"
-
-            batch_no = item.get("batch_no", "")
-            batch_no_length = len(batch_no)
-            if batch_no_length < 7:
-                batch_no = f"{batch_no}\t\t"
-            elif batch_no_length < 12:
-                batch_no = f"{batch_no}\t"
-            else:
-                batch_no = batch_no[:11] + "\t"
-
-            exp = item.get("exp_date", "MM/YYYY")
-            exp = f"{exp[:3]}{exp[5:7]}\t"
-
-            qty = item.get("quantity", 0)
-            qty = f"{qty}".ljust(5)
-
-            price = item.get("price", 0)
-            price = f"{price:.2f}\t"
-
-            amount = item.get("total", 0)
-            amount = f"{amount:.2f}".rjust(9)
-
-            items += f"{sn}{particular}{batch_no}{exp}{qty}{price}{amount}\n"
-
-        replacement_dictionary = {
-            "[----]": id_string,
-            "DD/MM/YYYY": date_string,
-            "[Customer Name]": customer_name,
-            "[Bill]": "\n" + items,
-            "[TTTTT.00]": total,
-            "[DDDDD.00]": discount,
-            "[NNNNN.00]": net_total,
-            "[PPPPPPPPPPP]": payment_type,
-        }
-
-        def replace_string(paragraph, old_string, new_string):
-            inline = paragraph.runs
-            for i in range(len(inline)):
-                if old_string in inline[i].text:
-                    text = inline[i].text.replace(str(old_string), str(new_string))
-                    inline[i].text = text
-
-        for paragraph in document.paragraphs:
-            for old_string, new_string in replacement_dictionary.items():
-                if old_string in paragraph.text:
-                    replace_string(paragraph, old_string, new_string)
-
-        document.save("bill_output.docx")
-        os.startfile("bill_output.docx", "print")
+        try:
+            print_bill(bill, "bill")
+        except (OSError, ValueError, subprocess.CalledProcessError) as error:
+            show_message(title="Print Failed", message=str(error))
 
 
 class ServiceBillWindow(QWidget):
     def __init__(self, service_bill_id: int):
         super(ServiceBillWindow, self).__init__()
         self.service_bill_id = service_bill_id
-        loadUi("UI/service_bill.ui", self)
+        setup_ui(self, "service_bill")
         self.load_pharma_info()
         self.load_service_bill()
 
@@ -185,6 +121,7 @@ class ServiceBillWindow(QWidget):
 
     def load_service_bill(self):
         bill = get_service_bill(id=self.service_bill_id)
+        release_session()
         if bill is None:
             self.customer_name.setText("Name: Bill doesn't exist.")
             return None
@@ -209,74 +146,7 @@ class ServiceBillWindow(QWidget):
         self.button_print.clicked.connect(lambda: self.print_to_printer(bill))
 
     def print_to_printer(self, bill):
-        document = Document("service_bill_sample.docx")
-
-        id_string = f"[{bill.id:04d}]"
-        date_string = bill.bill_date.strftime("%d/%m/%Y")
-        customer_name = bill.patient_name
-        items = ""
-        total = f"{bill.total_amount:8.2f}"
-        discount = f"{bill.discount:8.2f}"
-        net_total = f"{bill.net_amount:8.2f}"
-        payment_type = f"[{bill.payment_type}]".rjust(11)
-
-        for i, item in enumerate(json.loads(bill.bill_json)):
-            sn = f"{i:02d}  "
-
-            particular = item.get("particular", "")
-            particular_length = len(particular)
-            if particular_length < 10:
-                particular = f"{particular}\t\t"
-            elif particular_length < 16:
-                particular = f"{particular}\t"
-            else:
-                particular = particular[:15] + "\t"
-
-            batch_no = item.get("batch_no", "")
-            batch_no_length = len(batch_no)
-            if batch_no_length < 7:
-                batch_no = f"{batch_no}\t\t"
-            elif batch_no_length < 12:
-                batch_no = f"{batch_no}\t"
-            else:
-                batch_no = batch_no[:11] + "\t"
-
-            exp = item.get("exp_date", "MM/YYYY")
-            exp = f"{exp[:3]}{exp[5:7]}\t"
-
-            qty = item.get("quantity", 0)
-            qty = f"{qty}".ljust(5)
-
-            price = item.get("price", 0)
-            price = f"{price:.2f}\t"
-
-            amount = item.get("total", 0)
-            amount = f"{amount:.2f}".rjust(9)
-
-            items += f"{sn}{particular}{batch_no}{exp}{qty}{price}{amount}\n"
-
-        replacement_dictionary = {
-            "[----]": id_string,
-            "DD/MM/YYYY": date_string,
-            "[Customer Name]": customer_name,
-            "[Bill]": "\n" + items,
-            "[TTTTT.00]": total,
-            "[DDDDD.00]": discount,
-            "[NNNNN.00]": net_total,
-            "[PPPPPPPPPPP]": payment_type,
-        }
-
-        def replace_string(paragraph, old_string, new_string):
-            inline = paragraph.runs
-            for i in range(len(inline)):
-                if old_string in inline[i].text:
-                    text = inline[i].text.replace(str(old_string), str(new_string))
-                    inline[i].text = text
-
-        for paragraph in document.paragraphs:
-            for old_string, new_string in replacement_dictionary.items():
-                if old_string in paragraph.text:
-                    replace_string(paragraph, old_string, new_string)
-
-        document.save("service_bill_output.docx")
-        os.startfile("service_bill_output.docx", "print")
+        try:
+            print_bill(bill, "service_bill")
+        except (OSError, ValueError, subprocess.CalledProcessError) as error:
+            show_message(title="Print Failed", message=str(error))
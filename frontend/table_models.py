@@ -0,0 +1,110 @@
+from typing import Callable
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtGui import QColor, QFont
+
+from .executor import BackendExecutor
+from .side_windows import show_message
+
+
+# Shows the list[dict] rows returned by the backend.get_* functions. Rows are either set
+# all at once with set_rows, or pulled a page at a time with set_pager, in which case the
+# view asks for the next page through canFetchMore/fetchMore when scrolled to the bottom.
+# Pages are fetched on the executor and appended when they arrive, one at a time.
+class DictTableModel(QAbstractTableModel):
+    def __init__(self, columns: list[tuple[str, str]], page_size: int = 100, executor: BackendExecutor | None = None, parent=None):
+        super(DictTableModel, self).__init__(parent)
+        self.columns = columns
+        self.page_size = page_size
+        self.executor = executor
+        self.page_key = f"page_{id(self)}"
+        self.rows: list[dict] = list()
+        self.fetch_page: Callable[[tuple | None, int], list[dict]] | None = None
+        self.cursor: tuple | None = None
+        self.pages_left: bool = False
+        self.fetching: bool = False
+
+        self.header_font = QFont("Segoe UI", 10)
+        self.header_font.setBold(True)
+
+    def set_rows(self, rows: list[dict]):
+        self.stop_fetching()
+        self.beginResetModel()
+        self.rows = list(rows)
+        self.fetch_page = None
+        self.cursor = None
+        self.pages_left = False
+        self.endResetModel()
+
+    def set_pager(self, fetch_page: Callable[[tuple | None, int], list[dict]]):
+        self.stop_fetching()
+        self.beginResetModel()
+        self.rows = list()
+        self.fetch_page = fetch_page
+        self.cursor = None
+        self.pages_left = True
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def row(self, row_no: int) -> dict:
+        return self.rows[row_no]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row.get(self.columns[index.column()][1])
+        if role == Qt.ItemDataRole.BackgroundRole and row.get("color") is not None:
+            return QColor(*row.get("color"))
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation != Qt.Orientation.Horizontal:
+            return super(DictTableModel, self).headerData(section, orientation, role)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.columns[section][0]
+        if role == Qt.ItemDataRole.FontRole:
+            return self.header_font
+        return None
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if parent.isValid():
+            return False
+        return self.fetch_page is not None and self.pages_left and not self.fetching
+
+    def fetchMore(self, parent: QModelIndex):
+        if not self.canFetchMore(parent):
+            return None
+        self.fetching = True
+        fetch_page, cursor, page_size = self.fetch_page, self.cursor, self.page_size
+        self.executor.submit(lambda: fetch_page(cursor, page_size), self.page_loaded, self.page_failed, key=self.page_key)
+
+    def stop_fetching(self):
+        if self.fetching:
+            self.executor.cancel(self.page_key)
+            self.fetching = False
+
+    def page_failed(self, error: Exception):
+        self.fetching = False
+        self.pages_left = False
+        show_message(title="Error", message=str(error))
+
+    def page_loaded(self, rows: list[dict]):
+        self.fetching = False
+        self.pages_left = len(rows) == self.page_size
+        if not rows:
+            return None
+        self.cursor = rows[-1].get("cursor")
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
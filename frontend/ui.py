@@ -0,0 +1,37 @@
+import os
+import importlib.util
+from PyQt6.QtWidgets import QWidget
+
+COMPILED_DIRECTORY = os.path.join("UI", "compiled")
+
+
+def compiled_module(name: str):
+    # The .ui files stay the source, they are compiled to Python the first time they are
+    # used after a change so later starts only import the generated setupUi code.
+    source = os.path.join("UI", f"{name}.ui")
+    target = os.path.join(COMPILED_DIRECTORY, f"{name}_ui.py")
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source):
+        from PyQt6.uic import compileUi
+
+        os.makedirs(COMPILED_DIRECTORY, exist_ok=True)
+        with open(target + ".part", "w", encoding="utf-8") as file:
+            compileUi(source, file)
+        os.replace(target + ".part", target)
+    spec = importlib.util.spec_from_file_location(f"{name}_ui", target)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def setup_ui(widget: QWidget, name: str):
+    # Same result as loadUi: every child widget becomes an attribute of the widget.
+    try:
+        module = compiled_module(name)
+    except OSError:
+        from PyQt6.uic import loadUi
+
+        loadUi(os.path.join("UI", f"{name}.ui"), widget)
+        return None
+    form = next(value for key, value in vars(module).items() if key.startswith("Ui_"))()
+    form.setupUi(widget)
+    widget.__dict__.update(vars(form))
@@ -1,13 +1,27 @@
+import startup
 import sys
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
-from frontend.main_window import MainWindow
+startup.mark("Qt imported")
+from frontend.main_window import MainWindow  # noqa: E402
+startup.mark("frontend imported")
+
+
+def first_paint(app: QApplication):
+    startup.mark("billing screen shown")
+    startup.report()
+    if startup.SETTING == "exit":
+        app.quit()
 
 
 def window():
     app = QApplication(sys.argv)
     win = MainWindow()
+    startup.mark("main window built")
 
     win.show()
+    # A zero timer fires once the event loop has painted the window.
+    QTimer.singleShot(0, lambda: first_paint(app))
     app.exec()
 
 
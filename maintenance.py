@@ -0,0 +1,89 @@
+import argparse
+from datetime import date, datetime, time, timedelta
+
+from backend import rebuild_daily_sales, rebuild_item_daily_sales, rebuild_expiry_buckets, snapshot_stock, check_stock_ledger
+from backend import iter_bill_chunks, get_reorder_suggestions
+from printing import export_bills
+from replenishment import write_purchase_order
+from reports import REPORTS, PERIODS, write_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance tasks for the pharmacy database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-daily-sales", help="Recompute the daily_sales rollup from every bill and service bill.")
+    subparsers.add_parser("rebuild-item-sales", help="Recompute the item_daily_sales rollup from every bill line, at the batch price each was sold at.")
+    subparsers.add_parser("rebuild-expiry-buckets", help="Recompute the expiry buckets of every item as of today.")
+    subparsers.add_parser("snapshot-stock", help="Save the current stock as yesterday's closing stock, run it after midnight.")
+    subparsers.add_parser("check-stock-ledger", help="List batches whose quantity doesn't match their stock movements.")
+    order_parser = subparsers.add_parser("purchase-order", help="Write the items that need reordering to a purchase order CSV.")
+    order_parser.add_argument("--output", help="Defaults to purchase_order_<today>.csv")
+    order_parser.add_argument("--lead-days", type=int, default=7, help="Days until an order arrives.")
+    order_parser.add_argument("--cover-days", type=int, default=30, help="Days of sales an order should cover after it arrives.")
+    report_parser = subparsers.add_parser("report", help="Write a sales, discount or margin report to CSV.")
+    report_parser.add_argument("name", choices=list(REPORTS))
+    report_parser.add_argument("--start", type=date.fromisoformat, help="First day, YYYY-MM-DD.")
+    report_parser.add_argument("--end", type=date.fromisoformat, help="Day after the last one, YYYY-MM-DD.")
+    report_parser.add_argument("--period", choices=PERIODS + ["item"], help="Grouping of sales, discounts and margin.")
+    report_parser.add_argument("--type", dest="bill_type", choices=["bill", "service_bill"], default="bill")
+    report_parser.add_argument("--by", choices=["total", "quantity"], default="total", help="Ranking of top-items.")
+    report_parser.add_argument("--limit", type=int, default=20, help="Number of top-items.")
+    report_parser.add_argument("--output", help="Defaults to <name>_<today>.csv")
+    export_parser = subparsers.add_parser("export-bills", help="Render every bill in a date range into one PDF or text file.")
+    export_parser.add_argument("start", type=date.fromisoformat, help="First day, YYYY-MM-DD.")
+    export_parser.add_argument("end", type=date.fromisoformat, nargs="?", help="Last day, defaults to the first one.")
+    export_parser.add_argument("--type", dest="bill_type", choices=["bill", "service_bill"], default="bill")
+    export_parser.add_argument("--format", dest="output_format", choices=["pdf", "text"], default="pdf")
+    export_parser.add_argument("--output", help="Defaults to <type>s_<start>_<end>.pdf/.txt")
+    export_parser.add_argument("--workers", type=int, help="Rendering processes, defaults to the number of CPUs.")
+    args = parser.parse_args()
+
+    if args.command == "rebuild-daily-sales":
+        rebuild_daily_sales()
+        print("daily_sales rebuilt.")
+    elif args.command == "rebuild-item-sales":
+        rebuild_item_daily_sales()
+        print("item_daily_sales rebuilt.")
+    elif args.command == "rebuild-expiry-buckets":
+        rebuild_expiry_buckets()
+        print("expiry_bucket rebuilt.")
+    elif args.command == "snapshot-stock":
+        snapshot_stock()
+        print("stock_snapshot up to date.")
+    elif args.command == "check-stock-ledger":
+        mismatches = check_stock_ledger()
+        for mismatch in mismatches:
+            print(f"{mismatch.get('item_code')} {mismatch.get('batch_no')}: batch {mismatch.get('quantity')}, ledger {mismatch.get('ledger')}")
+        print(f"{len(mismatches)} batch(es) out of balance.")
+        if mismatches:
+            raise SystemExit(1)
+    elif args.command == "purchase-order":
+        output = args.output or f"purchase_order_{date.today()}.csv"
+        count = write_purchase_order(output, get_reorder_suggestions(args.lead_days, args.cover_days))
+        print(f"{count} items written to {output}.")
+    elif args.command == "report":
+        options = {"start": args.start, "end": args.end}
+        if args.name == "top-items":
+            options.update(limit=args.limit, by=args.by)
+        elif args.name == "margin":
+            options.update(group=args.period or "month")
+        elif args.period == "item":
+            parser.error("only the margin report can be grouped by item.")
+        elif args.name != "payment-types":
+            options.update(period=args.period or ("day" if args.name == "sales" else "month"))
+        if args.name != "top-items" and args.name != "margin":
+            options.update(bill_type=args.bill_type)
+        output = args.output or f"{args.name}_{date.today()}.csv"
+        count = write_report(output, REPORTS[args.name](**options))
+        print(f"{count} rows written to {output}.")
+    elif args.command == "export-bills":
+        end = args.end or args.start
+        extension = "pdf" if args.output_format == "pdf" else "txt"
+        output = args.output or f"{args.bill_type}s_{args.start}_{end}.{extension}"
+        chunks = iter_bill_chunks(datetime.combine(args.start, time.min), datetime.combine(end, time.min) + timedelta(days=1), args.bill_type)
+        count = export_bills(chunks, output, args.bill_type, args.output_format, args.workers)
+        print(f"{count} bills written to {output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import json
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Engine, Connection
+
+
+def merge_duplicate_batches(connection: Connection):
+    # Older databases could hold the same (item_code, batch_no) more than once,
+    # fold those into the oldest row so the unique index can be created.
+    duplicates = connection.execute(text(
+        "SELECT item_code, batch_no, MIN(id), SUM(quantity) FROM batch "
+        "GROUP BY item_code, batch_no HAVING COUNT(*) > 1"
+    )).all()
+    for item_code, batch_no, keep_id, quantity in duplicates:
+        connection.execute(text("UPDATE batch SET quantity = :quantity WHERE id = :id"), {"quantity": quantity, "id": keep_id})
+        connection.execute(
+            text("DELETE FROM batch WHERE item_code = :item_code AND batch_no = :batch_no AND id != :id"),
+            {"item_code": item_code, "batch_no": batch_no, "id": keep_id}
+        )
+
+
+def add_batch_indexes(connection: Connection):
+    merge_duplicate_batches(connection)
+    connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_batch_item_code_batch_no ON batch (item_code, batch_no)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_batch_exp_date ON batch (exp_date)"))
+
+
+def add_bill_date_indexes(connection: Connection):
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_bill_bill_date ON bill (bill_date)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_service_bill_bill_date ON service_bill (bill_date)"))
+
+
+def backfill_bill_lines(connection: Connection):
+    last_id = 0
+    while True:
+        bills = connection.execute(
+            text("SELECT id, bill_json FROM bill WHERE id > :last_id ORDER BY id LIMIT 1000"),
+            {"last_id": last_id}
+        ).all()
+        if not bills:
+            break
+        lines = list()
+        for bill_id, bill_json in bills:
+            for line in json.loads(bill_json or "[]"):
+                if line.get("item_code") is None:
+                    continue
+                lines.append({
+                    "bill_id": bill_id,
+                    "item_code": line.get("item_code"),
+                    "batch_no": line.get("batch_no"),
+                    "quantity": line.get("quantity"),
+                    "price": line.get("price"),
+                    "total": line.get("total"),
+                })
+        if lines:
+            connection.execute(text(
+                "INSERT INTO bill_line (bill_id, item_code, batch_no, quantity, price, total) "
+                "VALUES (:bill_id, :item_code, :batch_no, :quantity, :price, :total)"
+            ), lines)
+        last_id = bills[-1][0]
+
+
+def rebuild_daily_sales(connection: Connection):
+    connection.execute(text("DELETE FROM daily_sales"))
+    for bill_type in ("bill", "service_bill"):
+        connection.execute(text(
+            "INSERT INTO daily_sales (sales_date, bill_type, payment_type, bill_count, gross, discount, net) "
+            f"SELECT DATE(bill_date), '{bill_type}', payment_type, COUNT(*), SUM(total_amount), SUM(discount), SUM(net_amount) "
+            f"FROM {bill_type} GROUP BY DATE(bill_date), payment_type"
+        ))
+
+
+def rebuild_item_daily_sales(connection: Connection):
+    connection.execute(text("DELETE FROM item_daily_sales"))
+    connection.execute(text(
+        "INSERT INTO item_daily_sales (sales_date, item_code, quantity, total) "
+        "SELECT DATE(bill.bill_date), bill_line.item_code, SUM(bill_line.quantity), SUM(bill_line.total) "
+        "FROM bill_line JOIN bill ON bill.id = bill_line.bill_id "
+        "WHERE bill_line.item_code IS NOT NULL GROUP BY DATE(bill.bill_date), bill_line.item_code"
+    ))
+
+
+def rebuild_costed_item_daily_sales(connection: Connection):
+    # Only for add_item_daily_sales_cost, from before bill_line kept the cost. Lines are
+    # costed at the current batch price, lines whose batch no longer exists are added to
+    # uncosted instead.
+    connection.execute(text("DELETE FROM item_daily_sales"))
+    connection.execute(text(
+        "INSERT INTO item_daily_sales (sales_date, item_code, quantity, total, cost, uncosted) "
+        "SELECT DATE(bill.bill_date), bill_line.item_code, SUM(bill_line.quantity), SUM(bill_line.total), "
+        "SUM(COALESCE(bill_line.quantity * batch.price, 0)), SUM(CASE WHEN batch.id IS NULL THEN bill_line.total ELSE 0 END) "
+        "FROM bill_line JOIN bill ON bill.id = bill_line.bill_id "
+        "LEFT JOIN batch ON batch.item_code = bill_line.item_code AND batch.batch_no = bill_line.batch_no "
+        "WHERE bill_line.item_code IS NOT NULL GROUP BY DATE(bill.bill_date), bill_line.item_code"
+    ))
+
+
+def rebuild_item_daily_sales_at_sale_cost(connection: Connection):
+    # Lines are costed at the batch price they were sold at, so rebuilding doesn't restate
+    # past margins after a batch is repriced. Lines without one are added to uncosted.
+    connection.execute(text("DELETE FROM item_daily_sales"))
+    connection.execute(text(
+        "INSERT INTO item_daily_sales (sales_date, item_code, quantity, total, cost, uncosted) "
+        "SELECT DATE(bill.bill_date), bill_line.item_code, SUM(bill_line.quantity), SUM(bill_line.total), "
+        "SUM(COALESCE(bill_line.quantity * bill_line.cost, 0)), SUM(CASE WHEN bill_line.cost IS NULL THEN bill_line.total ELSE 0 END) "
+        "FROM bill_line JOIN bill ON bill.id = bill_line.bill_id "
+        "WHERE bill_line.item_code IS NOT NULL GROUP BY DATE(bill.bill_date), bill_line.item_code"
+    ))
+
+
+VELOCITY_WINDOWS = [7, 30, 90]
+
+
+def rebuild_item_velocity(connection: Connection, today: date | None = None):
+    # Units sold per item in the last 7, 30 and 90 days, today included.
+    today = today or date.today()
+    since = {f"since_{days}": (today - timedelta(days=days)).isoformat() for days in VELOCITY_WINDOWS}
+    connection.execute(text("DELETE FROM item_velocity"))
+    connection.execute(text(
+        "INSERT INTO item_velocity (item_code, sold_7, sold_30, sold_90, as_of) "
+        "SELECT item_code, "
+        "SUM(CASE WHEN sales_date > :since_7 THEN quantity ELSE 0 END), "
+        "SUM(CASE WHEN sales_date > :since_30 THEN quantity ELSE 0 END), "
+        "SUM(quantity), :today "
+        "FROM item_daily_sales WHERE sales_date > :since_90 AND sales_date <= :today GROUP BY item_code"
+    ), {**since, "today": today.isoformat()})
+
+
+def add_batch_expiry_index(connection: Connection):
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_batch_item_code_exp_date ON batch (item_code, exp_date)"))
+
+
+EXPIRY_BUCKETS = ["expired", "1_month", "3_months", "6_months", "later"]
+
+
+def rebuild_expiry_buckets(connection: Connection, item_codes: list[str] | None = None, today: date | None = None):
+    # Batches expire at the start of their exp_date month, so a batch whose month has begun
+    # counts as expired, same as the yellow rows on the batch page.
+    today = today or date.today()
+    month = today.replace(day=1)
+    bounds = {
+        "expired": month.isoformat(),
+        "one_month": (month + relativedelta(months=1)).isoformat(),
+        "three_months": (month + relativedelta(months=3)).isoformat(),
+        "six_months": (month + relativedelta(months=6)).isoformat(),
+        "today": today.isoformat(),
+    }
+    condition = "item_code IS NOT NULL"
+    if item_codes is not None:
+        condition = "item_code IN :item_codes"
+        bounds["item_codes"] = item_codes
+    delete_statement = text(f"DELETE FROM expiry_bucket WHERE {condition}")
+    insert_statement = text(
+        "INSERT INTO expiry_bucket (item_code, bucket, batch_count, quantity, value, as_of) "
+        "SELECT item_code, CASE "
+        "WHEN exp_date <= :expired THEN 'expired' "
+        "WHEN exp_date <= :one_month THEN '1_month' "
+        "WHEN exp_date <= :three_months THEN '3_months' "
+        "WHEN exp_date <= :six_months THEN '6_months' "
+        "ELSE 'later' END AS bucket, COUNT(*), SUM(quantity), SUM(quantity * price), :today "
+        f"FROM batch WHERE {condition} AND quantity != 0 GROUP BY item_code, bucket"
+    )
+    if item_codes is not None:
+        delete_statement = delete_statement.bindparams(bindparam("item_codes", expanding=True))
+        insert_statement = insert_statement.bindparams(bindparam("item_codes", expanding=True))
+    connection.execute(delete_statement, {"item_codes": item_codes} if item_codes is not None else {})
+    connection.execute(insert_statement, bounds)
+
+
+def open_stock_ledger(connection: Connection):
+    # Stock received before the ledger existed has no movements, its current balance is
+    # recorded as one opening adjustment per batch so the ledger adds up to the batch table.
+    connection.execute(text(
+        "INSERT INTO stock_movement (ts, item_code, batch_no, kind, quantity) "
+        "SELECT :ts, item_code, batch_no, 'adjustment', quantity FROM batch WHERE item_code IS NOT NULL AND quantity != 0"
+    ), {"ts": datetime.now().isoformat(sep=" ")})
+
+
+def add_item_daily_sales_cost(connection: Connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(item_daily_sales)"))}
+    for column in ("cost", "uncosted"):
+        if column not in columns:
+            connection.execute(text(f"ALTER TABLE item_daily_sales ADD COLUMN {column} FLOAT"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_item_daily_sales_item_code_totals "
+        "ON item_daily_sales (item_code, sales_date, quantity, total, cost, uncosted)"
+    ))
+    rebuild_costed_item_daily_sales(connection)
+
+
+def add_bill_line_cost(connection: Connection):
+    # Lines sold before the cost was kept get the batch price at the time of the upgrade,
+    # lines of batches that are gone stay uncosted.
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(bill_line)"))}
+    if "cost" not in columns:
+        connection.execute(text("ALTER TABLE bill_line ADD COLUMN cost FLOAT"))
+    connection.execute(text(
+        "UPDATE bill_line SET cost = (SELECT batch.price FROM batch "
+        "WHERE batch.item_code = bill_line.item_code AND batch.batch_no = bill_line.batch_no) WHERE cost IS NULL"
+    ))
+
+
+def add_item_daily_sales_date_index(connection: Connection):
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_item_daily_sales_date_totals "
+        "ON item_daily_sales (sales_date, quantity, total, cost, uncosted)"
+    ))
+
+
+# Append new migrations to the end, never reorder or remove them.
+# The position of a migration in this list is its schema version.
+MIGRATIONS = [
+    add_batch_indexes,
+    add_bill_date_indexes,
+    backfill_bill_lines,
+    rebuild_daily_sales,
+    add_batch_expiry_index,
+    rebuild_expiry_buckets,
+    open_stock_ledger,
+    rebuild_item_daily_sales,
+    rebuild_item_velocity,
+    add_item_daily_sales_cost,
+    add_bill_line_cost,
+    add_item_daily_sales_date_index,
+]
+
+
+def run_migrations(engine: Engine):
+    with engine.begin() as connection:
+        version = connection.execute(text("PRAGMA user_version")).scalar()
+        for migration in MIGRATIONS[version:]:
+            migration(connection)
+        if version < len(MIGRATIONS):
+            connection.execute(text(f"PRAGMA user_version = {len(MIGRATIONS)}"))
@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine, ForeignKey
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, ForeignKey, Index
 from sqlalchemy import Column, String, Integer, Float, Date, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base, relationship, backref
+from migrations import run_migrations
 BaseModel = declarative_base()
 
 
@@ -24,15 +26,20 @@ class Item(BaseModel):
 
 class Batch(BaseModel):
     __tablename__ = "batch"
+    __table_args__ = (
+        Index("ix_batch_item_code_batch_no", "item_code", "batch_no", unique=True),
+        Index("ix_batch_item_code_exp_date", "item_code", "exp_date"),
+    )
 
     id = Column("id", Integer, primary_key=True, autoincrement=True)
     batch_no = Column("batch_no", String(100), index=True)
     quantity = Column("quantity", Integer)
     price = Column("price", Float)
     mfg_date = Column("mfg_date", Date)
-    exp_date = Column("exp_date", Date)
+    exp_date = Column("exp_date", Date, index=True)
     item_code = Column(String(64), ForeignKey("item.code", ondelete="CASCADE"))
-    item = relationship("Item", backref="batches")
+    # Deleting an item leaves its batches and their item_code alone, delete_item zeroes them.
+    item = relationship("Item", backref=backref("batches", passive_deletes="all"))
 
     def __init__(self, item_code, batch_no, quantity, price, mfg_date, exp_date):
         self.batch_no = batch_no
@@ -56,7 +63,7 @@ class Bill(BaseModel):
     discount = Column("discount", Float)
     net_amount = Column("net_amount", Float)
     payment_type = Column("payment_type", String(64))
-    bill_date = Column("bill_date", DateTime)
+    bill_date = Column("bill_date", DateTime, index=True)
 
     def __init__(self, customer_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date):
         self.customer_name = customer_name
@@ -71,6 +78,35 @@ class Bill(BaseModel):
         return f"{self.id}. {self.customer_name}"
 
 
+class BillLine(BaseModel):
+    __tablename__ = "bill_line"
+    __table_args__ = (
+        Index("ix_bill_line_item_code_batch_no", "item_code", "batch_no"),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    bill_id = Column(Integer, ForeignKey("bill.id", ondelete="CASCADE"), index=True)
+    item_code = Column("item_code", String(64))
+    batch_no = Column("batch_no", String(100))
+    quantity = Column("quantity", Integer)
+    price = Column("price", Float)
+    total = Column("total", Float)
+    # The batch price when the line was sold, None when it couldn't be costed.
+    cost = Column("cost", Float)
+    bill = relationship("Bill", backref="lines")
+
+    def __init__(self, item_code, batch_no, quantity, price, total, cost=None):
+        self.item_code = item_code
+        self.batch_no = batch_no
+        self.quantity = quantity
+        self.price = price
+        self.total = total
+        self.cost = cost
+
+    def __repr__(self):
+        return f"{self.bill_id}. {self.item_code} x {self.quantity}"
+
+
 class ServiceBill(BaseModel):
     __tablename__ = "service_bill"
 
@@ -81,7 +117,7 @@ class ServiceBill(BaseModel):
     discount = Column("discount", Float)
     net_amount = Column("net_amount", Float)
     payment_type = Column("payment_type", String(64))
-    bill_date = Column("bill_date", DateTime)
+    bill_date = Column("bill_date", DateTime, index=True)
 
     def __init__(self, patient_name, bill_json, total_amount, discount, net_amount, payment_type, bill_date):
         self.patient_name = patient_name
@@ -96,8 +132,194 @@ class ServiceBill(BaseModel):
         return f"{self.id}. {self.patient_name}"
 
 
-engine = create_engine("sqlite:///mydb.db", echo=False)
+class DailySales(BaseModel):
+    __tablename__ = "daily_sales"
+    __table_args__ = (
+        Index("ix_daily_sales_date_type_payment", "sales_date", "bill_type", "payment_type", unique=True),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    sales_date = Column("sales_date", Date)
+    bill_type = Column("bill_type", String(16))
+    payment_type = Column("payment_type", String(64))
+    bill_count = Column("bill_count", Integer)
+    gross = Column("gross", Float)
+    discount = Column("discount", Float)
+    net = Column("net", Float)
+
+    def __init__(self, sales_date, bill_type, payment_type, bill_count, gross, discount, net):
+        self.sales_date = sales_date
+        self.bill_type = bill_type
+        self.payment_type = payment_type
+        self.bill_count = bill_count
+        self.gross = gross
+        self.discount = discount
+        self.net = net
+
+    def __repr__(self):
+        return f"{self.sales_date} {self.bill_type} {self.payment_type}: {self.net}"
+
+
+class ItemDailySales(BaseModel):
+    __tablename__ = "item_daily_sales"
+    __table_args__ = (
+        Index("ix_item_daily_sales_date_item_code", "sales_date", "item_code", unique=True),
+        Index("ix_item_daily_sales_item_code_totals", "item_code", "sales_date", "quantity", "total", "cost", "uncosted"),
+        Index("ix_item_daily_sales_date_totals", "sales_date", "quantity", "total", "cost", "uncosted"),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    sales_date = Column("sales_date", Date)
+    item_code = Column("item_code", String(64))
+    quantity = Column("quantity", Integer)
+    total = Column("total", Float)
+    cost = Column("cost", Float)
+    uncosted = Column("uncosted", Float)
+
+    def __repr__(self):
+        return f"{self.sales_date} {self.item_code}: {self.quantity}"
+
+
+class ItemVelocity(BaseModel):
+    __tablename__ = "item_velocity"
+    __table_args__ = (
+        Index("ix_item_velocity_item_code", "item_code", unique=True),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    item_code = Column("item_code", String(64))
+    sold_7 = Column("sold_7", Integer)
+    sold_30 = Column("sold_30", Integer)
+    sold_90 = Column("sold_90", Integer)
+    as_of = Column("as_of", Date)
+
+    def __repr__(self):
+        return f"{self.item_code}: {self.sold_7}/{self.sold_30}/{self.sold_90}"
+
+
+class ExpiryBucket(BaseModel):
+    __tablename__ = "expiry_bucket"
+    __table_args__ = (
+        Index("ix_expiry_bucket_item_code_bucket", "item_code", "bucket", unique=True),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    item_code = Column("item_code", String(64))
+    bucket = Column("bucket", String(16))
+    batch_count = Column("batch_count", Integer)
+    quantity = Column("quantity", Integer)
+    value = Column("value", Float)
+    as_of = Column("as_of", Date)
+
+    def __repr__(self):
+        return f"{self.item_code} {self.bucket}: {self.quantity}"
+
+
+class StockSnapshot(BaseModel):
+    __tablename__ = "stock_snapshot"
+    __table_args__ = (
+        Index("ix_stock_snapshot_date_item_code_batch_no", "snapshot_date", "item_code", "batch_no", unique=True),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    snapshot_date = Column("snapshot_date", Date)
+    item_code = Column("item_code", String(64))
+    batch_no = Column("batch_no", String(100))
+    quantity = Column("quantity", Integer)
+    price = Column("price", Float)
+    exp_date = Column("exp_date", Date)
+
+    def __repr__(self):
+        return f"{self.snapshot_date} {self.item_code} {self.batch_no}: {self.quantity}"
+
+
+class StockMovement(BaseModel):
+    __tablename__ = "stock_movement"
+    __table_args__ = (
+        Index("ix_stock_movement_item_code_ts", "item_code", "ts"),
+        Index("ix_stock_movement_item_code_batch_no_quantity", "item_code", "batch_no", "quantity"),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    ts = Column("ts", DateTime)
+    item_code = Column("item_code", String(64))
+    batch_no = Column("batch_no", String(100))
+    kind = Column("kind", String(16))
+    quantity = Column("quantity", Integer)
+    bill_id = Column("bill_id", Integer)
+
+    def __repr__(self):
+        return f"{self.ts} {self.item_code} {self.batch_no} {self.kind}: {self.quantity}"
+
+
+engine = create_engine(
+    "sqlite:///mydb.db",
+    echo=False,
+    pool_size=5,
+    max_overflow=10,
+    connect_args={"timeout": 30},
+)
+
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers keep going while another connection writes, and NORMAL sync is
+    # still durable under WAL except for power loss right after a commit.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+    # pysqlite only sends BEGIN before the first INSERT/UPDATE, so reads ahead of a write
+    # ran outside the transaction. With its own transaction handling off, BEGIN is sent
+    # from the begin event below instead.
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def begin_transaction(connection):
+    # transaction() asks for BEGIN IMMEDIATE, which takes the write lock before its first
+    # read, so nothing it reads can change before it writes. Other transactions only read
+    # a snapshot until they write and don't block the writer.
+    connection.exec_driver_sql("BEGIN IMMEDIATE" if connection.get_execution_options().get("immediate") else "BEGIN")
+
+
 BaseModel.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 Session = sessionmaker(bind=engine)
-session = Session()
+# One session per thread, so backend functions can also run on worker threads.
+session = scoped_session(Session)
+
+
+@contextmanager
+def transaction():
+    # Commits when the outermost block exits and rolls back if it raises, so a failed
+    # commit never leaves the thread's session unusable. Nested blocks join the outer one.
+    depth = session.info.get("transaction_depth", 0)
+    session.info["transaction_depth"] = depth + 1
+    try:
+        if depth == 0:
+            # Reads made before the block ended up in a deferred transaction, it is closed
+            # so the block starts its own with the write lock held.
+            if session().in_transaction():
+                session.commit()
+            session.connection(execution_options={"immediate": True})
+        yield session
+        if depth == 0:
+            session.commit()
+            for callback in session.info.pop("on_commit", []):
+                callback()
+    except Exception:
+        if depth == 0:
+            session.info.pop("on_commit", None)
+            session.rollback()
+        raise
+    finally:
+        session.info["transaction_depth"] = depth
+
+
+def on_commit(callback):
+    # Called inside a transaction() block, runs callback once the outermost block has
+    # committed. Nothing runs if it rolls back instead.
+    session.info.setdefault("on_commit", []).append(callback)
@@ -0,0 +1,296 @@
+import io
+import os
+import re
+import sys
+import json
+import uuid
+import tempfile
+import subprocess
+from collections import deque
+from typing import BinaryIO, Iterable
+from types import SimpleNamespace
+from functools import lru_cache
+from dotenv import dotenv_values
+
+EMU_PER_POINT = 12700
+PLACEHOLDERS = {
+    "[----]": "id",
+    "DD/MM/YYYY": "date",
+    "[Customer Name]": "customer_name",
+    "[Bill]": "items",
+    "[TTTTT.00]": "total",
+    "[DDDDD.00]": "discount",
+    "[NNNNN.00]": "net_total",
+    "[PPPPPPPPPPP]": "payment_type",
+}
+PLACEHOLDER_PATTERN = re.compile("|".join(re.escape(placeholder) for placeholder in PLACEHOLDERS))
+TEMPLATES = {"bill": "bill_sample.docx", "service_bill": "service_bill_sample.docx"}
+
+
+class BillTemplate:
+    # The .docx is only read to get its lines and page size, every line is split once
+    # into literal text and placeholder fields so rendering is a single join.
+    def __init__(self, lines: list[list[str | tuple[str]]], page_size: tuple[float, float]):
+        self.lines = lines
+        self.page_size = page_size
+
+    @classmethod
+    def from_docx(cls, path: str) -> "BillTemplate":
+        from docx import Document
+
+        document = Document(path)
+        lines = list()
+        for paragraph in document.paragraphs:
+            parts: list[str | tuple[str]] = list()
+            position = 0
+            for match in PLACEHOLDER_PATTERN.finditer(paragraph.text):
+                parts.append(paragraph.text[position:match.start()])
+                parts.append((PLACEHOLDERS[match.group()],))
+                position = match.end()
+            parts.append(paragraph.text[position:])
+            lines.append(parts)
+        section = document.sections[0]
+        return cls(lines, (section.page_width / EMU_PER_POINT, section.page_height / EMU_PER_POINT))
+
+    def render(self, fields: dict[str, str]) -> str:
+        return "\n".join("".join(fields[part[0]] if isinstance(part, tuple) else part for part in line) for line in self.lines).expandtabs(8)
+
+
+@lru_cache(maxsize=None)
+def cached_template(path: str, modified: float) -> BillTemplate:
+    return BillTemplate.from_docx(path)
+
+
+def load_template(bill_type: str) -> BillTemplate:
+    path = TEMPLATES[bill_type]
+    return cached_template(path, os.path.getmtime(path))
+
+
+def format_line(sn: int, item: dict, name_key: str) -> str:
+    particular = item.get(name_key) or ""
+    if len(particular) < 10:
+        particular = f"{particular}\t\t"
+    elif len(particular) < 16:
+        particular = f"{particular}\t"
+    else:
+        particular = particular[:15] + "\t"
+
+    batch_no = item.get("batch_no") or ""
+    if len(batch_no) < 7:
+        batch_no = f"{batch_no}\t\t"
+    elif len(batch_no) < 12:
+        batch_no = f"{batch_no}\t"
+    else:
+        batch_no = batch_no[:11] + "\t"
+
+    exp = item.get("exp_date") or "MM/YYYY"
+    exp = f"{exp[:3]}{exp[5:7]}\t"
+    qty = f"{item.get('quantity', 0)}".ljust(5)
+    price = f"{item.get('price', 0):.2f}\t"
+    amount = f"{item.get('total', 0):.2f}".rjust(9)
+    return f"{sn:02d}  {particular}{batch_no}{exp}{qty}{price}{amount}\n"
+
+
+def bill_fields(bill, bill_type: str) -> dict[str, str]:
+    name_key = "item_name" if bill_type == "bill" else "particular"
+    items = "".join(format_line(i, item, name_key) for i, item in enumerate(json.loads(bill.bill_json)))
+    return {
+        "id": f"[{bill.id:04d}]",
+        "date": bill.bill_date.strftime("%d/%m/%Y"),
+        "customer_name": bill.customer_name if bill_type == "bill" else bill.patient_name,
+        "items": "\n" + items,
+        "total": f"{bill.total_amount:8.2f}",
+        "discount": f"{bill.discount:8.2f}",
+        "net_total": f"{bill.net_amount:8.2f}",
+        "payment_type": f"[{bill.payment_type}]".rjust(11),
+    }
+
+
+def render_text(bill, bill_type: str = "bill") -> str:
+    return load_template(bill_type).render(bill_fields(bill, bill_type))
+
+
+def render_escpos(bill, bill_type: str = "bill") -> bytes:
+    # Initialize, print the text, feed a few lines and do a partial cut.
+    text = render_text(bill, bill_type)
+    return b"\x1b@" + text.encode("cp437", errors="replace") + b"\n\n\n\x1dV\x42\x00"
+
+
+def pdf_string(text: str) -> bytes:
+    return text.encode("latin-1", errors="replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def page_streams(text: str, page_size: tuple[float, float], font_size: float = 8.0, margin: float = 24.0) -> list[bytes]:
+    # One content stream per page, a text that is too long runs onto further pages.
+    width, height = page_size
+    leading = font_size * 1.2
+    lines_per_page = max(int((height - 2 * margin) / leading), 1)
+    lines = text.split("\n")
+    streams = list()
+    for start in range(0, len(lines), lines_per_page):
+        body = b"".join(b"(" + pdf_string(line) + b") '\n" for line in lines[start:start + lines_per_page])
+        streams.append(b"BT\n/F1 %.1f Tf\n%.1f TL\n%.1f %.1f Td\n" % (font_size, leading, margin, height - margin) + body + b"ET")
+    return streams
+
+
+class PdfWriter:
+    # Pages are written to the file as they are added, only their object numbers are kept,
+    # so a PDF of thousands of bills doesn't have to be built in memory first.
+    # Courier is one of the standard PDF fonts, so nothing has to be embedded.
+    def __init__(self, file: BinaryIO, page_size: tuple[float, float]):
+        self.file = file
+        self.page_size = page_size
+        self.position = 0
+        self.offsets: dict[int, int] = dict()
+        self.kids: list[int] = list()
+        self.next_number = 4
+        self.write(b"%PDF-1.4\n")
+        self.write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+    def write(self, data: bytes):
+        self.file.write(data)
+        self.position += len(data)
+
+    def write_object(self, number: int, body: bytes):
+        self.offsets[number] = self.position
+        self.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def add_page(self, stream: bytes):
+        contents, page = self.next_number, self.next_number + 1
+        self.next_number += 2
+        self.write_object(contents, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self.write_object(page, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.1f %.1f] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (*self.page_size, contents))
+        self.kids.append(page)
+
+    def close(self):
+        self.write_object(2, b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % kid for kid in self.kids) + b"] /Count %d >>" % len(self.kids))
+        self.write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.position
+        self.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_number)
+        self.write(b"".join(b"%010d 00000 n \n" % self.offsets[number] for number in range(1, self.next_number)))
+        self.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.next_number, xref))
+
+
+def render_pdf_pages(texts: list[str], page_size: tuple[float, float]) -> bytes:
+    output = io.BytesIO()
+    writer = PdfWriter(output, page_size)
+    for text in texts:
+        for stream in page_streams(text, page_size):
+            writer.add_page(stream)
+    writer.close()
+    return output.getvalue()
+
+
+def render_pdf(bill, bill_type: str = "bill") -> bytes:
+    return render_pdf_pages([render_text(bill, bill_type)], load_template(bill_type).page_size)
+
+
+RENDERERS = {
+    "text": (lambda bill, bill_type: render_text(bill, bill_type).encode("utf-8"), "txt"),
+    "escpos": (render_escpos, "bin"),
+    "pdf": (render_pdf, "pdf"),
+}
+
+
+class FileSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, data: bytes, name: str):
+        with open(self.path, "wb") as file:
+            file.write(data)
+
+
+class SpoolSink:
+    # Files are written under a temporary name and renamed, so whatever watches the
+    # directory never picks up half a bill.
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, data: bytes, name: str):
+        stem, extension = os.path.splitext(name)
+        path = os.path.join(self.directory, f"{stem}_{uuid.uuid4().hex[:8]}{extension}")
+        with open(path + ".part", "wb") as file:
+            file.write(data)
+        os.replace(path + ".part", path)
+
+
+class StdoutSink:
+    def write(self, data: bytes, name: str):
+        sys.stdout.buffer.write(data)
+        sys.stdout.flush()
+
+
+class SystemPrinterSink:
+    def write(self, data: bytes, name: str):
+        path = os.path.join(tempfile.gettempdir(), name)
+        with open(path, "wb") as file:
+            file.write(data)
+        if sys.platform == "win32":
+            os.startfile(path, "print")
+        else:
+            subprocess.run(["lp", path], check=True)
+
+
+def sink_from_setting(setting: str | None):
+    # PRINTER in .env: "file:<path>", "spool:<directory>", "stdout" or unset for the system printer.
+    if not setting:
+        return SystemPrinterSink()
+    kind, _, target = setting.partition(":")
+    if kind == "file":
+        return FileSink(target)
+    if kind == "spool":
+        return SpoolSink(target)
+    if kind == "stdout":
+        return StdoutSink()
+    raise ValueError(f"Unknown PRINTER setting {setting!r}.")
+
+
+def print_bill(bill, bill_type: str = "bill", output_format: str | None = None, sink=None):
+    if output_format is None or sink is None:
+        env = dotenv_values(".env")
+        output_format = output_format or env.get("PRINT_FORMAT") or "text"
+        sink = sink or sink_from_setting(env.get("PRINTER"))
+    render, extension = RENDERERS[output_format]
+    sink.write(render(bill, bill_type), f"{bill_type}_{bill.id:04d}.{extension}")
+
+
+def render_chunk(bill_type: str, output_format: str, bills: list[dict]) -> list[bytes]:
+    # Runs in the export workers, each of which parses the template once and keeps it.
+    texts = [render_text(SimpleNamespace(**bill), bill_type) for bill in bills]
+    if output_format == "pdf":
+        page_size = load_template(bill_type).page_size
+        return [stream for text in texts for stream in page_streams(text, page_size)]
+    return ["".join(text + "\n\f" for text in texts).encode("utf-8")]
+
+
+def export_bills(chunks: Iterable[list[dict]], path: str, bill_type: str = "bill", output_format: str = "pdf", workers: int | None = None) -> int:
+    # Chunks are rendered across a process pool and written in order as they finish. At most
+    # two chunks per worker are in flight, so memory stays flat however long the range is.
+    # Text archives separate bills with a form feed, which starts a new page on a printer.
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    with ProcessPoolExecutor(workers) as pool, open(path, "wb") as file:
+        writer = PdfWriter(file, load_template(bill_type).page_size) if output_format == "pdf" else None
+
+        def write(pages: list[bytes]):
+            for page in pages:
+                if writer is not None:
+                    writer.add_page(page)
+                else:
+                    file.write(page)
+
+        pending = deque()
+        for chunk in chunks:
+            count += len(chunk)
+            pending.append(pool.submit(render_chunk, bill_type, output_format, chunk))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+        if writer is not None:
+            writer.close()
+    return count
@@ -0,0 +1,43 @@
+import json
+from types import SimpleNamespace
+from datetime import date, datetime
+
+
+# JSON has no dates, tuples or objects, so they travel as single-key tagged dicts.
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_value(item) for item in value]}
+    if isinstance(value, SimpleNamespace):
+        return {"__object__": encode_value(vars(value))}
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    return value
+
+
+def decode_object(value: dict):
+    if len(value) != 1:
+        return value
+    key, item = next(iter(value.items()))
+    if key == "__datetime__":
+        return datetime.fromisoformat(item)
+    if key == "__date__":
+        return date.fromisoformat(item)
+    if key == "__tuple__":
+        return tuple(item)
+    if key == "__object__":
+        return SimpleNamespace(**item)
+    return value
+
+
+def dumps(value) -> bytes:
+    return json.dumps(encode_value(value)).encode("utf-8")
+
+
+def loads(data: bytes):
+    return json.loads(data.decode("utf-8"), object_hook=decode_object)
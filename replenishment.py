@@ -0,0 +1,43 @@
+import csv
+import math
+
+PURCHASE_ORDER_COLUMNS = [
+    ("Code", "code"),
+    ("Item", "name"),
+    ("Order Quantity", "order_quantity"),
+    ("On Hand", "on_hand"),
+    ("Sold (7 days)", "sold_7"),
+    ("Sold (30 days)", "sold_30"),
+    ("Sold (90 days)", "sold_90"),
+    ("Days Left", "days_left"),
+]
+
+
+def daily_rate(sold_7: int, sold_30: int) -> float:
+    # The last week counts when it runs faster than the month, so an item that suddenly
+    # sells is reordered before the monthly average catches up.
+    return max(sold_7 / 7, sold_30 / 30)
+
+
+def reorder_line(sold_7: int, sold_30: int, on_hand: int, lead_days: int, cover_days: int) -> dict:
+    # Reorder once the stock only lasts until a new order could arrive, and order enough
+    # to cover the lead time plus cover_days more.
+    rate = daily_rate(sold_7, sold_30)
+    reorder_point = math.ceil(rate * lead_days)
+    order_quantity = max(math.ceil(rate * (lead_days + cover_days)) - on_hand, 0)
+    return {
+        "rate": rate,
+        "days_left": on_hand / rate if rate else math.inf,
+        "reorder_point": reorder_point,
+        "order_quantity": order_quantity,
+        "reorder": rate > 0 and on_hand <= reorder_point and order_quantity > 0,
+    }
+
+
+def write_purchase_order(path: str, suggestions: list[dict]) -> int:
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow([header for header, _ in PURCHASE_ORDER_COLUMNS])
+        for suggestion in suggestions:
+            writer.writerow([suggestion.get(key) for _, key in PURCHASE_ORDER_COLUMNS])
+    return len(suggestions)
@@ -0,0 +1,183 @@
+import csv
+from datetime import date, datetime, time
+from sqlalchemy import func, select, case
+from models import session, Item, Bill, ServiceBill, DailySales, ItemDailySales
+
+PERIODS = ["day", "week", "month", "year"]
+
+
+def period_of(column, period: str):
+    # Dates are stored as ISO text, so a prefix of it is the day, month or year and costs far
+    # less per row than strftime. Weeks are labelled with their Monday.
+    if period == "day":
+        return func.substr(column, 1, 10)
+    if period == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    if period == "month":
+        return func.substr(column, 1, 7)
+    if period == "year":
+        return func.substr(column, 1, 4)
+    raise ValueError(f"{period} is not one of {', '.join(PERIODS)}.")
+
+
+def money(value: float | None) -> str:
+    return "{:.2f}".format(value or 0.0)
+
+
+def percent(part: float | None, whole: float | None) -> str:
+    return "{:.1f}".format(100 * (part or 0.0) / whole) if whole else ""
+
+
+def in_range(column, start: date | None, end: date | None, as_datetime: bool = False) -> list:
+    conditions = list()
+    if start is not None:
+        conditions.append(column >= (datetime.combine(start, time.min) if as_datetime else start))
+    if end is not None:
+        conditions.append(column < (datetime.combine(end, time.min) if as_datetime else end))
+    return conditions
+
+
+def get_sales_by_period(start: date | None = None, end: date | None = None, period: str = "day", bill_type: str = "bill") -> list[dict]:
+    key = period_of(DailySales.sales_date, period).label("period")
+    totals = select(
+        key,
+        func.sum(DailySales.bill_count).label("bill_count"),
+        func.sum(DailySales.gross).label("gross"),
+        func.sum(DailySales.discount).label("discount"),
+        func.sum(DailySales.net).label("net"),
+    ).where(DailySales.bill_type == bill_type, *in_range(DailySales.sales_date, start, end)).group_by(key).subquery()
+    rows = session.execute(select(
+        totals,
+        func.sum(totals.c.net).over(order_by=totals.c.period).label("running_net"),
+        func.lag(totals.c.net).over(order_by=totals.c.period).label("previous_net"),
+    ).order_by(totals.c.period))
+    return [{
+        "period": row.period,
+        "bill_count": str(row.bill_count),
+        "gross": money(row.gross),
+        "discount": money(row.discount),
+        "net": money(row.net),
+        "running_net": money(row.running_net),
+        "change": percent(row.net - row.previous_net, row.previous_net) if row.previous_net is not None else "",
+    } for row in rows]
+
+
+def get_sales_by_payment_type(start: date | None = None, end: date | None = None, bill_type: str = "bill") -> list[dict]:
+    net = func.sum(DailySales.net)
+    rows = session.execute(select(
+        DailySales.payment_type,
+        func.sum(DailySales.bill_count).label("bill_count"),
+        net.label("net"),
+        func.sum(net).over().label("all_net"),
+    ).where(DailySales.bill_type == bill_type, *in_range(DailySales.sales_date, start, end)).group_by(DailySales.payment_type).order_by(net.desc()))
+    return [{
+        "payment_type": row.payment_type,
+        "bill_count": str(row.bill_count),
+        "net": money(row.net),
+        "share": percent(row.net, row.all_net),
+    } for row in rows]
+
+
+def get_top_items(start: date | None = None, end: date | None = None, limit: int = 20, by: str = "total") -> list[dict]:
+    # Ranked by sales value or units sold, with each item's share and the running share so
+    # the few items that make most of the sales stand out.
+    if by not in ("total", "quantity"):
+        raise ValueError(f"{by} is not total or quantity.")
+    totals = select(
+        ItemDailySales.item_code,
+        func.sum(ItemDailySales.quantity).label("quantity"),
+        func.sum(ItemDailySales.total).label("total"),
+    ).where(*in_range(ItemDailySales.sales_date, start, end)).group_by(ItemDailySales.item_code).subquery()
+    measure = totals.c.total if by == "total" else totals.c.quantity
+    ranked = select(
+        totals,
+        func.rank().over(order_by=measure.desc()).label("rank"),
+        func.sum(measure).over().label("all_measure"),
+        func.sum(measure).over(order_by=(measure.desc(), totals.c.item_code), rows=(None, 0)).label("running_measure"),
+    ).order_by(measure.desc(), totals.c.item_code).limit(limit).subquery()
+    # Names are looked up for the top rows only, after grouping.
+    rows = session.execute(select(ranked, Item.name).outerjoin(Item, Item.code == ranked.c.item_code).order_by(ranked.c.rank, ranked.c.item_code))
+    return [{
+        "rank": str(row.rank),
+        "code": row.item_code,
+        "name": row.name or row.item_code,
+        "quantity": str(row.quantity),
+        "total": money(row.total),
+        "share": percent(row.total if by == "total" else row.quantity, row.all_measure),
+        "running_share": percent(row.running_measure, row.all_measure),
+    } for row in rows]
+
+
+def get_discount_report(start: date | None = None, end: date | None = None, period: str = "month", bill_type: str = "bill") -> list[dict]:
+    model = Bill if bill_type == "bill" else ServiceBill
+    key = period_of(model.bill_date, period).label("period")
+    rows = session.execute(select(
+        key,
+        func.count().label("bill_count"),
+        func.sum(case((model.discount > 0, 1), else_=0)).label("discounted"),
+        func.sum(model.total_amount).label("gross"),
+        func.sum(model.discount).label("discount"),
+    ).where(*in_range(model.bill_date, start, end, as_datetime=True)).group_by(key).order_by(key))
+    return [{
+        "period": row.period,
+        "bill_count": str(row.bill_count),
+        "discounted": str(row.discounted),
+        "gross": money(row.gross),
+        "discount": money(row.discount),
+        "discount_share": percent(row.discount, row.gross),
+        "average_discount": money(row.discount / row.discounted) if row.discounted else "",
+    } for row in rows]
+
+
+def get_gross_margin(start: date | None = None, end: date | None = None, group: str = "month") -> list[dict]:
+    # Bill line totals against the batch price of what was sold, per period or per item.
+    # Sales of batches that were gone when item_daily_sales was rebuilt can't be costed,
+    # they are reported apart instead of as pure margin.
+    # Periods are summed per day first, straight down the sales_date covering index with no
+    # sort, and only the days are grouped into periods.
+    column = ItemDailySales.item_code if group == "item" else ItemDailySales.sales_date
+    totals = select(
+        column.label("group_key"),
+        func.sum(ItemDailySales.quantity).label("quantity"),
+        func.sum(ItemDailySales.total - ItemDailySales.uncosted).label("revenue"),
+        func.sum(ItemDailySales.cost).label("cost"),
+        func.sum(ItemDailySales.uncosted).label("uncosted"),
+    ).where(*in_range(ItemDailySales.sales_date, start, end)).group_by(column)
+    if group != "item":
+        days = totals.subquery()
+        key = period_of(days.c.group_key, group).label("group_key")
+        totals = select(
+            key,
+            func.sum(days.c.quantity).label("quantity"),
+            func.sum(days.c.revenue).label("revenue"),
+            func.sum(days.c.cost).label("cost"),
+            func.sum(days.c.uncosted).label("uncosted"),
+        ).group_by(key)
+    rows = session.execute(totals.order_by("group_key"))
+    return [{
+        group: row.group_key,
+        "quantity": str(row.quantity),
+        "revenue": money(row.revenue),
+        "cost": money(row.cost),
+        "margin": money(row.revenue - row.cost),
+        "margin_percent": percent(row.revenue - row.cost, row.revenue),
+        "uncosted": money(row.uncosted),
+    } for row in rows]
+
+
+REPORTS = {
+    "sales": get_sales_by_period,
+    "payment-types": get_sales_by_payment_type,
+    "top-items": get_top_items,
+    "discounts": get_discount_report,
+    "margin": get_gross_margin,
+}
+
+
+def write_report(path: str, rows: list[dict]) -> int:
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if rows:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    return len(rows)
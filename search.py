@@ -0,0 +1,114 @@
+import re
+from heapq import nsmallest
+from bisect import bisect_left, insort
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def name_words(name: str) -> list[str]:
+    return re.sub('[^A-Za-z0-9]+', ' ', name).lower().split()
+
+
+def prefix_end(prefix: str) -> str:
+    # The first string after every string starting with prefix.
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class ItemSearchIndex:
+    # Every typed word has to match an item either as the start of its code or of a word
+    # in its name, or, for words of three or more characters, anywhere inside the code.
+    # The code substring match is answered from a trigram index instead of LIKE '%word%'.
+    def __init__(self):
+        self.postings: dict[str, set[str]] = dict()
+        self.words: list[tuple[str, str]] = list()
+        self.codes: list[str] = list()
+        self.names: dict[str, str] = dict()
+        self.tokens: dict[str, tuple[str, ...]] = dict()
+        # " word1 word2 ...", so a word prefix is one substring test for " " + prefix.
+        self.token_text: dict[str, str] = dict()
+
+    def build(self, items: list[tuple[str, str]]):
+        self.postings = dict()
+        self.names = dict(items)
+        self.codes = sorted(self.names)
+        self.tokens = {code: tuple(name_words(name)) for code, name in self.names.items()}
+        self.token_text = {code: " " + " ".join(tokens) for code, tokens in self.tokens.items()}
+        for code in self.names:
+            for trigram in trigrams(code):
+                self.postings.setdefault(trigram, set()).add(code)
+        self.words = sorted({(word, code) for code, tokens in self.tokens.items() for word in (code, *tokens)})
+
+    def add(self, code: str, name: str):
+        if code in self.names:
+            self.remove(code)
+        self.names[code] = name
+        insort(self.codes, code)
+        self.tokens[code] = tuple(name_words(name))
+        self.token_text[code] = " " + " ".join(self.tokens[code])
+        for trigram in trigrams(code):
+            self.postings.setdefault(trigram, set()).add(code)
+        for word in {code, *self.tokens[code]}:
+            insort(self.words, (word, code))
+
+    def remove(self, code: str):
+        if self.names.pop(code, None) is None:
+            return None
+        tokens = self.tokens.pop(code)
+        del self.token_text[code]
+        del self.codes[bisect_left(self.codes, code)]
+        for trigram in trigrams(code):
+            codes = self.postings.get(trigram)
+            codes.discard(code)
+            if not codes:
+                del self.postings[trigram]
+        for word in {code, *tokens}:
+            index = bisect_left(self.words, (word, code))
+            if index < len(self.words) and self.words[index] == (word, code):
+                del self.words[index]
+
+    def prefix_matches(self, prefix: str) -> set[str]:
+        end = prefix_end(prefix)
+        return {code for _, code in self.words[bisect_left(self.words, (prefix, "")):bisect_left(self.words, (end, ""))]}
+
+    def substring_matches(self, word: str) -> set[str]:
+        # Verifying against the rarest trigram's codes is cheaper than intersecting them all.
+        rarest = min((self.postings.get(trigram, set()) for trigram in trigrams(word)), key=len)
+        return {code for code in rarest if word in code}
+
+    def search(self, text: str, limit: int = 50) -> list[str]:
+        words = name_words(text)
+        if not words:
+            return list()
+        query = "".join(words)
+
+        # Codes starting with the whole query rank above every other match, so when there
+        # are enough of them they are the answer and the rest of the index isn't scanned.
+        # With only short words the longest one is matched by prefix alone, which such a
+        # code needn't satisfy, so that case always takes the full path.
+        if len(words) == 1 or max(map(len, words)) >= 3:
+            starts = self.codes[bisect_left(self.codes, query):bisect_left(self.codes, prefix_end(query))]
+            if len(starts) >= limit:
+                return sorted(starts, key=len)[:limit]
+
+        # The longest word picks the candidates, the others only filter them. Whatever its
+        # length a word matches when it is inside the code or starts a word of the name.
+        candidates: set[str] | None = None
+        for word in sorted(words, key=len, reverse=True):
+            if candidates is not None:
+                token_prefix = " " + word
+                candidates = {code for code in candidates if word in code or token_prefix in self.token_text[code]}
+            else:
+                codes = self.prefix_matches(word)
+                if len(word) >= 3:
+                    codes |= self.substring_matches(word)
+                candidates = codes
+            if not candidates:
+                return list()
+
+        def rank(code: str):
+            position = code.find(words[0])
+            return (0 if code == query else 1 if code.startswith(query) else 2, position if position >= 0 else len(code), len(code), code)
+
+        return nsmallest(limit, candidates, key=rank)
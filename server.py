@@ -0,0 +1,151 @@
+import queue
+import argparse
+import threading
+from types import SimpleNamespace
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query
+
+import backend
+import protocol
+from models import BaseModel, session, transaction
+
+READ_FUNCTIONS = [
+    "get_item", "get_items", "search_items", "get_item_changes", "get_batches", "allocate_batches", "get_bill", "get_bills",
+    "get_service_bill", "get_service_bills", "get_item_sales", "get_daily_sales", "get_sales_summary",
+    "get_expiry_summary", "get_expiry_items", "get_value_at_risk", "get_stock_valuation", "get_stock_value_by_item",
+    "get_stock_value_by_expiry_month", "get_stock_movements", "check_stock_ledger",
+    "get_reorder_suggestions", "get_fast_movers", "get_sales_by_period", "get_sales_by_payment_type", "get_top_items",
+    "get_discount_report", "get_gross_margin",
+]
+# Reads that rebuild expiry_bucket or item_velocity on their first call of a day.
+ROLLING_READ_FUNCTIONS = ["get_expiry_summary", "get_expiry_items", "get_value_at_risk", "get_reorder_suggestions", "get_fast_movers"]
+WRITE_FUNCTIONS = [
+    "create_item", "create_batch", "create_bill", "create_service_bill", "create_item_and_batch",
+    "edit_item", "edit_batch", "delete_item", "delete_batch", "import_stock", "rebuild_daily_sales", "rebuild_expiry_buckets",
+    "snapshot_stock", "return_stock", "rebuild_item_daily_sales",
+]
+
+
+def to_plain(value):
+    if isinstance(value, BaseModel):
+        return SimpleNamespace(**{attribute.key: getattr(value, attribute.key) for attribute in inspect(value).mapper.column_attrs})
+    if isinstance(value, Query):
+        return [to_plain(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(to_plain(item) for item in value)
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
+
+
+class WriteQueue:
+    # Every write goes through one thread, so stock updates are applied one after another.
+    # Writes that arrive while a commit is running are applied together in the next
+    # transaction, sharing one commit; if any of them fails the group is rolled back and
+    # its writes are retried one at a time so only the failing one reports an error.
+    def __init__(self, max_group: int = 32):
+        self.max_group = max_group
+        self.jobs: queue.Queue[tuple[str, dict, Future]] = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, name: str, kwargs: dict):
+        future = Future()
+        self.jobs.put((name, kwargs, future))
+        return future.result()
+
+    def apply(self, name: str, kwargs: dict):
+        result = getattr(backend, name)(**kwargs)
+        session.flush()
+        return to_plain(result)
+
+    def run(self):
+        while True:
+            jobs = [self.jobs.get()]
+            while len(jobs) < self.max_group:
+                try:
+                    jobs.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with transaction():
+                    results = [self.apply(name, kwargs) for name, kwargs, _ in jobs]
+            except Exception:
+                backend.catalogue.invalidate()
+                for name, kwargs, future in jobs:
+                    try:
+                        with transaction():
+                            result = self.apply(name, kwargs)
+                    except Exception as error:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+            else:
+                for (_, _, future), result in zip(jobs, results):
+                    future.set_result(result)
+            finally:
+                session.remove()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    write_queue: WriteQueue
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.respond(200, {"result": "ok"})
+        else:
+            self.respond(404, {"error": f"{self.path} not found."})
+
+    def do_POST(self):
+        name = self.path.removeprefix("/api/")
+        if name not in READ_FUNCTIONS and name not in WRITE_FUNCTIONS:
+            self.respond(404, {"error": f"{name} is not part of the API."})
+            return None
+        kwargs = protocol.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        try:
+            if name in WRITE_FUNCTIONS:
+                result = self.write_queue.submit(name, kwargs)
+            else:
+                # The day's rebuild is a write, it goes through the writer before the read.
+                if name in ROLLING_READ_FUNCTIONS and not backend.rollups_rolled():
+                    self.write_queue.submit("roll_rollups", {})
+                result = to_plain(getattr(backend, name)(**kwargs))
+        except Exception as error:
+            self.respond(500, {"error": f"{type(error).__name__}: {error}"})
+        else:
+            self.respond(200, {"result": result})
+        finally:
+            session.remove()
+
+    def respond(self, status: int, body: dict):
+        data = protocol.dumps(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(host: str = "127.0.0.1", port: int = 8765, max_group: int = 32) -> ThreadingHTTPServer:
+    handler = type("Handler", (RequestHandler,), {"write_queue": WriteQueue(max_group)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the billing backend over HTTP/JSON for several counters.")
+    parser.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to accept counters from the LAN.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import sys
+import time
+
+# Imported first by main.py so the marks count from as close to process start as Python
+# allows. Set STARTUP_TIMING=1 to print them, STARTUP_TIMING=exit to also quit once the
+# billing screen has been painted (used by benchmarks/startup.py).
+START = time.perf_counter()
+SETTING = os.environ.get("STARTUP_TIMING")
+marks: list[tuple[str, float]] = list()
+
+
+def mark(label: str):
+    marks.append((label, time.perf_counter()))
+
+
+def report():
+    if not SETTING:
+        return None
+    previous = START
+    for label, moment in marks:
+        print(f"{label:<28}{(moment - START) * 1000:8.1f} ms  (+{(moment - previous) * 1000:.1f})", file=sys.stderr)
+        previous = moment
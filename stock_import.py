@@ -0,0 +1,86 @@
+import os
+import csv
+from datetime import date, datetime
+
+COLUMNS = ["name", "batch_no", "quantity", "price", "mfg_date", "exp_date"]
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%Y", "%m/%y"]
+
+
+def column_name(header) -> str:
+    return str(header or "").strip().lower().replace(" ", "_").replace(".", "")
+
+
+def read_stock_file(path: str) -> list[dict]:
+    # Every row keeps its line number in the file so errors can point back to it.
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            lines = list(csv.reader(file))
+    elif extension == ".xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("Reading .xlsx files needs openpyxl: pip install openpyxl") from None
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        lines = [list(values) for values in workbook.active.iter_rows(values_only=True)]
+        workbook.close()
+    else:
+        raise ValueError(f"{os.path.basename(path)} is not a .csv or .xlsx file.")
+    if not lines:
+        return list()
+    headers = [column_name(header) for header in lines[0]]
+    missing = [column for column in COLUMNS if column not in headers]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+    rows = list()
+    for row_no, values in enumerate(lines[1:], start=2):
+        if not any(value not in (None, "") for value in values):
+            continue
+        row = dict(zip(headers, values))
+        row["row"] = row_no
+        rows.append(row)
+    return rows
+
+
+def parse_date(value) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_stock_row(row: dict) -> tuple[dict | None, str | None]:
+    name = str(row.get("name") or "").strip()
+    batch_no = str(row.get("batch_no") or "").strip()
+    if not name or not batch_no:
+        return None, "Name and batch no. are required."
+    try:
+        quantity = float(row.get("quantity"))
+        price = float(row.get("price"))
+    except (TypeError, ValueError):
+        return None, "Quantity and price have to be numbers."
+    if quantity <= 0 or quantity != int(quantity):
+        return None, "Quantity has to be a whole number above 0."
+    if price < 0:
+        return None, "Price can't be negative."
+    mfg_date = parse_date(row.get("mfg_date"))
+    exp_date = parse_date(row.get("exp_date"))
+    if mfg_date is None or exp_date is None:
+        return None, "Dates have to be YYYY-MM-DD, DD/MM/YYYY or MM/YYYY."
+    mfg_date, exp_date = mfg_date.replace(day=1), exp_date.replace(day=1)
+    if exp_date <= mfg_date:
+        return None, "Expiry date has to be after the manufacturing date."
+    return {
+        "name": name,
+        "batch_no": batch_no,
+        "quantity": int(quantity),
+        "price": price,
+        "mfg_date": mfg_date,
+        "exp_date": exp_date,
+    }, None